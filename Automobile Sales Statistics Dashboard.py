@@ -1,17 +1,82 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import argparse
+import json
+import os
+from functools import lru_cache
+
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import pandas as pd
 import plotly.express as px
-
-# Load the data using pandas
-data = pd.read_csv('https://cf-courses-data.s3.us.cloud-object-storage.appdomain.cloud/IBMDeveloperSkillsNetwork-DV0101EN-SkillsNetwork/Data%20Files/historical_automobile_sales.csv')
+from plotly.io.json import to_json_plotly
+import pyarrow.feather as feather
+
+from dash_instrumentation import instrument, note_cache, phase
+from shared_dataset import SharedDataset, publish
+
+DATA_URL = 'https://cf-courses-data.s3.us.cloud-object-storage.appdomain.cloud/IBMDeveloperSkillsNetwork-DV0101EN-SkillsNetwork/Data%20Files/historical_automobile_sales.csv'
+
+# The data is served from a local snapshot in a typed columnar format. Bump the version
+# whenever the snapshot layout changes so stale snapshots are not picked up.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = os.environ.get('AUTOMOBILE_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+SNAPSHOT_PATH = os.path.join(SNAPSHOT_DIR, f'historical_automobile_sales.v{SNAPSHOT_VERSION}.feather')
+
+# Only go to the network when asked to (air-gapped deployments never do)
+allow_download = os.environ.get('AUTOMOBILE_ALLOW_DOWNLOAD') == '1'
+
+# Multi-worker serving: with AUTOMOBILE_SHARED_DIR set every worker maps the dataset
+# published there (--publish-shared) instead of loading its own copy, and switches to a
+# republished dataset without a restart
+SHARED_DIR = os.environ.get('AUTOMOBILE_SHARED_DIR')
+shared = SharedDataset(SHARED_DIR) if SHARED_DIR else None
+
+# With AUTOMOBILE_CLIENTSIDE=1 the dropdown toggle runs in the browser; the figures, which
+# need the aggregates, are still built on the server
+CLIENTSIDE = os.environ.get('AUTOMOBILE_CLIENTSIDE') == '1'
+
+def compact(data):
+    # Small integers for the calendar/flag columns, categoricals for the repeated labels
+    data = data.copy()
+    data['Year'] = data['Year'].astype('int16')
+    data['Recession'] = data['Recession'].astype('int8')
+    if pd.api.types.is_numeric_dtype(data['Month']):
+        data['Month'] = data['Month'].astype('int8')
+    else:
+        data['Month'] = data['Month'].astype('category')
+    for column in ['Vehicle_Type', 'City']:
+        if column in data:
+            data[column] = data[column].astype('category')
+    return data
+
+def write_snapshot(source=DATA_URL, path=SNAPSHOT_PATH):
+    data = compact(pd.read_csv(source))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    feather.write_feather(data, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return data
+
+def load_data():
+    if os.path.exists(SNAPSHOT_PATH):
+        # Memory-mapped, so several server processes share the page cache for the file
+        return feather.read_table(SNAPSHOT_PATH, memory_map=True).to_pandas()
+    if not allow_download:
+        raise FileNotFoundError(f'No data snapshot at {SNAPSHOT_PATH}. Build one with --build-snapshot '
+                                'or allow a download with AUTOMOBILE_ALLOW_DOWNLOAD=1')
+    return write_snapshot()
+
+def current_dataset():
+    # None outside the shared mode, where the data does not change while serving
+    return shared.current() if shared else None
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
+# WSGI entry point for multi-worker servers
+server = app.server
 
 # Create the layout of the app
 app.layout = html.Div([
@@ -38,66 +103,144 @@ app.layout = html.Div([
 ])
 
 # Disable year selection dropdown based on statistics selection
-@app.callback(
-    Output('select_year', 'disabled'),
-    Input('dropdown_statistics', 'value')
-)
 def update_year_dropdown(selected_statistics):
     return selected_statistics != 'Yearly Statistics'
 
+# update_year_dropdown in the browser
+UPDATE_YEAR_DROPDOWN_JS = """
+function(selected_statistics) {
+    return selected_statistics !== 'Yearly Statistics';
+}
+"""
+
+if CLIENTSIDE:
+    app.clientside_callback(UPDATE_YEAR_DROPDOWN_JS, Output('select_year', 'disabled'), Input('dropdown_statistics', 'value'))
+else:
+    app.callback(Output('select_year', 'disabled'), Input('dropdown_statistics', 'value'))(update_year_dropdown)
+
+# Precompute every aggregate the dashboard can show. None of them depend on the dropdowns
+# beyond picking a year, so callbacks only have to look them up.
+def build_aggregates(data):
+    recession_data = data[data['Recession'] == 1]
+    by_year_month = data.groupby(['Year', 'Month'], observed=True)['Automobile_Sales'].mean().reset_index()
+    by_year_type_sales = data.groupby(['Year', 'Vehicle_Type'], observed=True)['Automobile_Sales'].mean().reset_index()
+    by_year_type_exp = data.groupby(['Year', 'Vehicle_Type'], observed=True)['Advertising_Expenditure'].sum().reset_index()
+    return {
+        'yearly_sales': data.groupby('Year')['Automobile_Sales'].mean().reset_index(),
+        'recession': {
+            'yearly_rec': recession_data.groupby('Year')['Automobile_Sales'].mean().reset_index(),
+            'avg_sales_by_type': recession_data.groupby(['Year', 'Vehicle_Type'], observed=True)['Automobile_Sales'].mean().reset_index(),
+            'total_exp_by_type': recession_data.groupby('Vehicle_Type', observed=True)['Advertising_Expenditure'].sum().reset_index(),
+            'sales_by_ur_and_type': recession_data.groupby(['unemployment_rate', 'Vehicle_Type'], observed=True)['Automobile_Sales'].mean().reset_index(),
+        },
+        # Per-year tables, split once from a single groupby over all years
+        'monthly_sales': {year: table.drop(columns='Year') for year, table in by_year_month.groupby('Year')},
+        'avg_sales_by_type_yearly': {year: table.drop(columns='Year') for year, table in by_year_type_sales.groupby('Year')},
+        'exp_by_type_yearly': {year: table.drop(columns='Year') for year, table in by_year_type_exp.groupby('Year')},
+    }
+
+# Nothing is loaded at import time: the first request loads the snapshot (or maps the
+# shared dataset) and builds the aggregates, later requests for the same dataset reuse them
+@lru_cache(maxsize=1)
+def get_aggregates(dataset):
+    return build_aggregates(dataset.data if dataset else load_data())
+
+def year_table(dataset, name, year, columns):
+    # A year with no rows gets an empty table, the same as filtering it out of the data
+    return get_aggregates(dataset)[name].get(year, pd.DataFrame(columns=columns))
+
+# Figures are built in their dict form, so the dcc.Graph components skip the figure validation
+def build_figures(selected_statistics, selected_year, dataset):
+    if selected_statistics == 'Recession Period Statistics':
+        with phase('data'):
+            recession = get_aggregates(dataset)['recession']
+        with phase('figure'):
+            return (
+                # Plot 1: Automobile sales fluctuate over Recession Period
+                px.line(recession['yearly_rec'], x='Year', y='Automobile_Sales', title="Average Automobile Sales fluctuation over Recession Period").to_dict(),
+                # Plot 2: Average number of vehicles sold by vehicle type during recession
+                px.line(recession['avg_sales_by_type'], x='Year', y='Automobile_Sales', color='Vehicle_Type', title='Average number of vehicles sold by vehicle type during recession').to_dict(),
+                # Plot 3: Total expenditure share by vehicle type during recession
+                px.pie(recession['total_exp_by_type'], values='Advertising_Expenditure', names='Vehicle_Type', title='Total expenditure share by vehicle type during recessions').to_dict(),
+                # Plot 4: Effect of unemployment rate on vehicle type and sales
+                px.bar(recession['sales_by_ur_and_type'], x='unemployment_rate', y='Automobile_Sales', color='Vehicle_Type', title='Effect of unemployment rate on vehicle type and sales').to_dict(),
+            )
+
+    elif selected_statistics == 'Yearly Statistics':
+        with phase('data'):
+            monthly_sales = year_table(dataset, 'monthly_sales', selected_year, ['Month', 'Automobile_Sales'])
+            avg_sales_by_type = year_table(dataset, 'avg_sales_by_type_yearly', selected_year, ['Vehicle_Type', 'Automobile_Sales'])
+            exp_by_type = year_table(dataset, 'exp_by_type_yearly', selected_year, ['Vehicle_Type', 'Advertising_Expenditure'])
+        with phase('figure'):
+            return (
+                # Plot 1: Yearly Automobile sales (the same for every year)
+                yearly_sales_figure(dataset),
+                # Plot 2: Total Monthly Automobile sales
+                px.line(monthly_sales, x='Month', y='Automobile_Sales', title='Monthly Automobile sales').to_dict(),
+                # Plot 3: Average number of vehicles sold by vehicle type in the given year
+                px.bar(avg_sales_by_type, x='Vehicle_Type', y='Automobile_Sales', title=f'Average Vehicles Sold by Vehicle Type in {selected_year}').to_dict(),
+                # Plot 4: Total Advertisement Expenditure by vehicle type
+                px.pie(exp_by_type, values='Advertising_Expenditure', names='Vehicle_Type', title='Total expenditure share by vehicle type').to_dict(),
+            )
+
+@lru_cache(maxsize=1)
+def yearly_sales_figure(dataset):
+    return px.line(get_aggregates(dataset)['yearly_sales'], x='Year', y='Automobile_Sales', title='Yearly Automobile sales').to_dict()
+
+# The output of a selection is memoized in its encoded form. Dash always encodes a response
+# itself, so the components are encoded once with the same encoder and kept as the plain
+# lists/dicts/strings that decode from it: on a hit Dash encodes those in one pass instead of
+# walking the components and figures again. The cache is bounded and belongs to one dataset
+# version: a refresh drops it with the version, and a cold year is built once per version.
+@lru_cache(maxsize=1)
+def output_cache(dataset):
+    return lru_cache(maxsize=64)(lambda selected_statistics, selected_year:
+                                 build_output(selected_statistics, selected_year, dataset))
+
+def build_output(selected_statistics, selected_year, dataset):
+    figures = build_figures(selected_statistics, selected_year, dataset)
+    if figures is None:
+        return None
+    with phase('serialize'):
+        chart1, chart2, chart3, chart4 = [dcc.Graph(figure=figure) for figure in figures]
+        return json.loads(to_json_plotly([
+            html.Div(className='chart-item', children=[html.Div(children=chart1),html.Div(children=chart2)]),
+            html.Div(className='chart-item', children=[html.Div(children=chart3),html.Div(children=chart4)])
+        ]))
+
 # Update graphs based on selected statistics and year
 @app.callback(
     Output('output_container', 'children'),
     [Input('select_year', 'value'), Input('dropdown_statistics', 'value')]
 )
 def update_output(selected_year, selected_statistics):
+    # The recession view does not depend on the year, keep a single cache entry for it
     if selected_statistics == 'Recession Period Statistics':
-        recession_data = data[data['Recession'] == 1]
-
-        # Plot 1: Automobile sales fluctuate over Recession Period
-        yearly_rec = recession_data.groupby('Year')['Automobile_Sales'].mean().reset_index()
-        R_chart1 = dcc.Graph(figure=px.line(yearly_rec, x='Year', y='Automobile_Sales', title="Average Automobile Sales fluctuation over Recession Period"))
-
-        # Plot 2: Average number of vehicles sold by vehicle type during recession
-        avg_sales_by_type = recession_data.groupby(['Year', 'Vehicle_Type'])['Automobile_Sales'].mean().reset_index()
-        R_chart2 = dcc.Graph(figure=px.line(avg_sales_by_type, x='Year', y='Automobile_Sales', color='Vehicle_Type', title='Average number of vehicles sold by vehicle type during recession'))
-
-        # Plot 3: Total expenditure share by vehicle type during recession
-        total_exp_by_type = recession_data.groupby('Vehicle_Type')['Advertising_Expenditure'].sum().reset_index()
-        R_chart3 = dcc.Graph(figure=px.pie(total_exp_by_type, values='Advertising_Expenditure', names='Vehicle_Type', title='Total expenditure share by vehicle type during recessions'))
-
-        # Plot 4: Effect of unemployment rate on vehicle type and sales
-        sales_by_ur_and_type = recession_data.groupby(['unemployment_rate', 'Vehicle_Type'])['Automobile_Sales'].mean().reset_index()
-        R_chart4 = dcc.Graph(figure=px.bar(sales_by_ur_and_type, x='unemployment_rate', y='Automobile_Sales', color='Vehicle_Type', title='Effect of unemployment rate on vehicle type and sales'))
-
-        return [
-            html.Div(className='chart-item', children=[html.Div(children=R_chart1),html.Div(children=R_chart2)]),
-            html.Div(className='chart-item', children=[html.Div(children=R_chart3),html.Div(children=R_chart4)])
-        ]
-
-    elif selected_statistics == 'Yearly Statistics':
-        yearly_data = data[data['Year'] == selected_year]
-
-        # Plot 1: Yearly Automobile sales
-        yearly_sales = data.groupby('Year')['Automobile_Sales'].mean().reset_index()
-        Y_chart1 = dcc.Graph(figure=px.line(yearly_sales, x='Year', y='Automobile_Sales', title='Yearly Automobile sales'))
-
-        # Plot 2: Total Monthly Automobile sales
-        monthly_sales = yearly_data.groupby('Month')['Automobile_Sales'].mean().reset_index()
-        Y_chart2 = dcc.Graph(figure=px.line(monthly_sales, x='Month', y='Automobile_Sales', title='Monthly Automobile sales'))
-
-        # Plot 3: Average number of vehicles sold by vehicle type in the given year
-        avg_sales_by_type_yearly = yearly_data.groupby('Vehicle_Type')['Automobile_Sales'].mean().reset_index()
-        Y_chart3 = dcc.Graph(figure=px.bar(avg_sales_by_type_yearly, x='Vehicle_Type', y='Automobile_Sales', title=f'Average Vehicles Sold by Vehicle Type in {selected_year}'))
-
-        # Plot 4: Total Advertisement Expenditure by vehicle type
-        exp_by_type_yearly = yearly_data.groupby('Vehicle_Type')['Advertising_Expenditure'].sum().reset_index()
-        Y_chart4 = dcc.Graph(figure=px.pie(exp_by_type_yearly, values='Advertising_Expenditure', names='Vehicle_Type', title='Total expenditure share by vehicle type'))
+        selected_year = None
+    cached_output = output_cache(current_dataset())
+    hits = cached_output.cache_info().hits
+    output = cached_output(selected_statistics, selected_year)
+    note_cache(cached_output.cache_info().hits > hits)
+    return output
 
-        return [
-            html.Div(className='chart-item', children=[html.Div(children=Y_chart1),html.Div(children=Y_chart2)]),
-            html.Div(className='chart-item', children=[html.Div(children=Y_chart3),html.Div(children=Y_chart4)])
-        ]
+# Opt-in callback timings, see dash_instrumentation (DASH_INSTRUMENTATION=1)
+instrument(app)
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Automobile Sales Statistics Dashboard')
+    parser.add_argument('--build-snapshot', nargs='?', const=DATA_URL, metavar='CSV',
+                        help='Write the local data snapshot from CSV (default: the dataset URL) and exit')
+    parser.add_argument('--allow-download', action='store_true',
+                        help='Fetch the dataset from its URL if there is no local snapshot yet')
+    parser.add_argument('--publish-shared', metavar='DIR',
+                        help='Publish the snapshot to DIR for workers started with AUTOMOBILE_SHARED_DIR=DIR and exit')
+    args = parser.parse_args()
+    allow_download = allow_download or args.allow_download
+    if args.build_snapshot:
+        write_snapshot(args.build_snapshot)
+        print(f'Snapshot written to {SNAPSHOT_PATH}')
+    elif args.publish_shared:
+        version = publish(args.publish_shared, load_data())
+        print(f'Dataset version {version} published to {args.publish_shared}')
+    else:
+        app.run_server(debug=True)
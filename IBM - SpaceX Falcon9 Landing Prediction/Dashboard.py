@@ -3,30 +3,265 @@ import pandas as pd
 import dash
 import dash_html_components as html
 import dash_core_components as dcc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import MissingCallbackContextException
 import plotly.express as px
+import plotly.graph_objects as go
+import numpy as np
+import argparse
+import os
+import sys
+from functools import lru_cache
 
-spacex_df = pd.read_csv("spacex_launch_dash.csv")
-max_payload = spacex_df['Payload Mass (kg)'].max()
-min_payload = spacex_df['Payload Mass (kg)'].min()
+#dash_instrumentation lives at the top of the repository
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dash_instrumentation import instrument, phase
+from shared_dataset import SharedDataset, publish
+
+#Query index built once per dataset: for 'ALL' and every launch site, the payload mass, row
+#position, booster category code and class of its launches sorted by payload mass, so a
+#slider range is two binary searches and contiguous slices instead of a column scan.
+#A shared dataset carries the sorted arrays with it (see launch_index_arrays) and they are
+#mapped instead of rebuilt in every worker.
+INDEX_ARRAYS = ['payload', 'rows', 'booster', 'class']
+
+def build_launch_index(df, arrays=None):
+    site_codes, sites = pd.factorize(df['Launch Site'])
+    #pie chart tables, precomputed: successes per site and success/failure counts per site
+    class_counts = df.groupby(['Launch Site', 'class'], observed=True).size().reset_index(name='class count')
+    groups = [('ALL', df.groupby('Launch Site', sort=False)['class'].sum().reset_index())]
+    groups += [(site, class_counts[class_counts['Launch Site'] == site].reset_index(drop=True)) for site in sites]
+    #a cleared dropdown (or an unknown site) selects no launches, like filtering on it would
+    groups.append((None, class_counts.iloc[:0]))
+    if arrays is not None and 'boosters' in arrays:
+        boosters = arrays['boosters'].tolist()
+    else:
+        booster_codes, boosters = pd.factorize(df['Booster Version Category'])
+        boosters = list(boosters)
+        columns = {'payload': df['Payload Mass (kg)'].to_numpy(), 'booster': booster_codes.astype('int16'),
+                   'class': df['class'].to_numpy().astype('int8')}
+    index = {}
+    for code, (site, pie) in enumerate(groups, start=-1):
+        if arrays is not None and all(f'{name} {site}' in arrays for name in INDEX_ARRAYS):
+            entry = {name: arrays[f'{name} {site}'] for name in INDEX_ARRAYS}
+        elif site is None:
+            entry = {'payload': np.empty(0), 'rows': np.arange(0),
+                     'booster': np.empty(0, dtype='int16'), 'class': np.empty(0, dtype='int8')}
+        else:
+            rows = np.arange(len(df)) if site == 'ALL' else np.flatnonzero(site_codes == code)
+            rows = rows[np.argsort(columns['payload'][rows], kind='stable')]
+            entry = {name: values[rows] for name, values in columns.items()}
+            entry['rows'] = rows
+        entry.update(pie=pie, boosters=boosters)
+        index[site] = entry
+    return index
+
+def launch_index_arrays(index):
+    #the sorted arrays of an index, to publish alongside the launches
+    arrays = {'boosters': np.asarray(index['ALL']['boosters'], dtype=str)}
+    for site, entry in index.items():
+        if site is not None:
+            for name in INDEX_ARRAYS:
+                arrays[f'{name} {site}'] = entry[name]
+    return arrays
+
+def site_entry(launch_index, entered_site):
+    return launch_index.get(entered_site, launch_index[None])
+
+def payload_bounds(entry, low, high):
+    #slice of a site entry with low <= payload <= high
+    return (np.searchsorted(entry['payload'], low, side='left'),
+            np.searchsorted(entry['payload'], high, side='right'))
+
+def payload_rows(launch_index, entered_site, low, high):
+    #original row positions of the launches with low <= payload <= high, in file order
+    entry = site_entry(launch_index, entered_site)
+    start, stop = payload_bounds(entry, low, high)
+    return np.sort(entry['rows'][start:stop])
+
+#Large-point mode: a site with more launches than this gets a WebGL scatter of payload bins
+#per booster category and class instead of one marker per launch, so the figure (and the
+#patch sent on slider moves) has at most SCATTER_BINS points per category and class however
+#many launches are in range. Below it px.scatter already switches to WebGL past 1000 points.
+SCATTER_BIN_LAUNCHES = 5000
+SCATTER_BINS = 100
+
+def binned_scatter_traces(entry, low, high):
+    #per booster category: mean payload, class and launch count of every non-empty bin in range
+    #launches with no payload mass sort last and are never plotted, like in px.scatter
+    known_stop = np.searchsorted(entry['payload'], np.inf, side='right')
+    start, stop = payload_bounds(entry, low, high)
+    start, stop = min(start, known_stop), min(stop, known_stop)
+    payload = entry['payload'][start:stop]
+    booster = entry['booster'][start:stop].astype(np.int64)
+    landed = entry['class'][start:stop].astype(np.int64)
+    #bins span the whole site, so a point stays put while the slider moves
+    first, last = (entry['payload'][0], entry['payload'][known_stop - 1]) if known_stop else (0, 0)
+    width = (last - first) / SCATTER_BINS or 1
+    bins = np.minimum(((payload - first) / width).astype(np.int64), SCATTER_BINS - 1)
+    known = booster >= 0
+    key = ((booster * 2 + landed) * SCATTER_BINS + bins)[known]
+    shape = (len(entry['boosters']), 2, SCATTER_BINS)
+    counts = np.bincount(key, minlength=np.prod(shape)).reshape(shape)
+    sums = np.bincount(key, weights=payload[known], minlength=np.prod(shape)).reshape(shape)
+    largest = max(counts.max(), 1)
+    traces = []
+    for category in range(len(entry['boosters'])):
+        classes, positions = np.nonzero(counts[category])
+        count = counts[category][classes, positions]
+        traces.append({'x': np.round(sums[category][classes, positions] / count, 1), 'y': classes,
+                       'customdata': count, 'marker': {'size': np.round(6 + 14 * np.sqrt(count / largest), 1)}})
+    return traces
+
+def binned_scatter_figure(entry, traces, title):
+    fig = go.Figure([go.Scattergl(name=booster, mode='markers', x=trace['x'], y=trace['y'],
+                                  customdata=trace['customdata'], marker=trace['marker'],
+                                  hovertemplate='Payload Mass (kg)=%{x}<br>class=%{y}<br>launches=%{customdata}')
+                     for booster, trace in zip(entry['boosters'], traces)])
+    fig.update_layout(title=title, xaxis_title='Payload Mass (kg)', yaxis_title='class',
+                      legend_title_text='Booster Version Category')
+    return fig
+
+def scatter_traces_key(version, entered_site, entry):
+    #what the traces of a binned chart depend on (None for a px.scatter chart): a slider move
+    #can only patch the chart in the browser while this has not changed, a refresh of the
+    #shared dataset in between can add a booster category or move a site across the binning
+    if len(entry['rows']) <= SCATTER_BIN_LAUNCHES:
+        return None
+    return [version, entered_site, len(entry['boosters'])]
+
+def scatter_patch(traces):
+    #same traces as the chart in the browser (see scatter_traces_key): only their points change
+    patch = dash.Patch()
+    for position, trace in enumerate(traces):
+        for key in ['x', 'y', 'customdata']:
+            patch['data'][position][key] = trace[key]
+        patch['data'][position]['marker']['size'] = trace['marker']['size']
+    return patch
+
+def slider_moved():
+    #True when the payload slider alone triggered the running callback
+    try:
+        return list(dash.ctx.triggered_prop_ids) == ['payload-slider.value']
+    except MissingCallbackContextException:
+        return False
+
+#multi-worker serving: with SPACEX_SHARED_DIR set every worker maps the launches published
+#there (--publish-shared) instead of reading its own copy, and switches to a republished
+#dataset without a restart
+SHARED_DIR = os.environ.get('SPACEX_SHARED_DIR')
+shared = SharedDataset(SHARED_DIR) if SHARED_DIR else None
+
+#client-side mode: with SPACEX_CLIENTSIDE=1 the launches are shipped to the browser once in a
+#dcc.Store and the scatter chart is filtered there, so slider drags never reach the server.
+#Only for launch histories that are cheap to ship: with more launches than
+#SCATTER_BIN_LAUNCHES when the server starts, the chart stays on the server and is binned.
+CLIENTSIDE = os.environ.get('SPACEX_CLIENTSIDE') == '1'
+
+if shared is None:
+    spacex_df = pd.read_csv("spacex_launch_dash.csv")
+    launch_index = build_launch_index(spacex_df)
+
+@lru_cache(maxsize=1)
+def shared_launches(dataset):
+    return dataset.data, build_launch_index(dataset.data, dataset.arrays)
+
+def current_dataset():
+    #None outside the shared mode, where the launches do not change while serving
+    return shared.current() if shared else None
+
+def launches_of(dataset):
+    #the launches of a dataset and their index
+    if dataset is None:
+        return spacex_df, launch_index
+    return shared_launches(dataset)
+
+def current_launches():
+    return launches_of(current_dataset())
+
+CLIENTSIDE_SCATTER = CLIENTSIDE and len(current_launches()[1]['ALL']['rows']) <= SCATTER_BIN_LAUNCHES
+
+@lru_cache(maxsize=1)
+def client_store(dataset):
+    #the launch store, built once per dataset rather than on every page load
+    return client_launches(launches_of(dataset)[0])
+
+def client_launches(spacex_df):
+    #what the client-side scatter chart needs: sites and booster categories as codes into
+    #their names, payload (None when missing) and class in file order, and the px layout
+    site_codes, sites = pd.factorize(spacex_df['Launch Site'])
+    booster_codes, boosters = pd.factorize(spacex_df['Booster Version Category'])
+    payload = spacex_df['Payload Mass (kg)'].to_numpy(dtype=float)
+    #(the title is set in the browser, a placeholder keeps px from adding the untitled margin)
+    layout = px.scatter(spacex_df.iloc[:1], x='Payload Mass (kg)', y='class',
+                        color='Booster Version Category', title='title').to_plotly_json()['layout']
+    return {'site': site_codes.tolist(), 'sites': list(sites),
+            'booster': booster_codes.tolist(), 'boosters': list(boosters),
+            'payload': np.where(np.isnan(payload), None, payload).tolist(),
+            'class': spacex_df['class'].tolist(), 'layout': layout}
+
+#get_scatter_chart in the browser: the same traces px.scatter builds for the launches in range
+#(one per booster category in order of appearance, WebGL past 1000 points)
+SCATTER_CHART_JS = """
+function(entered_site, payload_slider, launches) {
+    if (!launches) {
+        return window.dash_clientside.no_update;
+    }
+    var layout = JSON.parse(JSON.stringify(launches.layout));
+    layout.title = {text: entered_site === 'ALL' ? 'Success count on Payload mass for all sites'
+        : 'Success count on Payload mass for Launch site ' + (entered_site === null ? 'None' : entered_site)};
+    var all = entered_site === 'ALL', site = launches.sites.indexOf(entered_site);
+    var traces = {}, names = [], count = 0;
+    for (var i = 0; i < launches.payload.length; i++) {
+        var payload = launches.payload[i];
+        if (!all && (site === -1 || launches.site[i] !== site)) continue;
+        if (payload === null || payload < payload_slider[0] || payload > payload_slider[1]) continue;
+        var name = launches.boosters[launches.booster[i]];
+        if (!traces.hasOwnProperty(name)) {
+            traces[name] = {x: [], y: []};
+            names.push(name);
+        }
+        traces[name].x.push(payload);
+        traces[name].y.push(launches['class'][i]);
+        count++;
+    }
+    if (!names.length) {
+        delete layout.legend.title;
+    }
+    var colorway = layout.template.layout.colorway;
+    var data = names.map(function(name, position) {
+        var trace = {
+            hovertemplate: 'Booster Version Category=' + name + '<br>Payload Mass (kg)=%{x}<br>class=%{y}<extra></extra>',
+            legendgroup: name, marker: {color: colorway[position % colorway.length], symbol: 'circle'},
+            mode: 'markers', name: name, showlegend: true, x: traces[name].x, xaxis: 'x',
+            y: traces[name].y, yaxis: 'y', type: count > 1000 ? 'scattergl' : 'scatter'
+        };
+        if (count <= 1000) {
+            trace.orientation = 'v';
+        }
+        return trace;
+    });
+    return {data: data, layout: layout};
+}
+"""
 
 # Create a dash application
 app = dash.Dash(__name__)
+#WSGI entry point for multi-worker servers
+server = app.server
 
-# Create an app layout
-app.layout = html.Div(children=[html.H1('SpaceX Launch Records Dashboard',
+# Create an app layout, built on every page load so a republished dataset shows up in it
+def serve_layout():
+    spacex_df, _ = current_launches()
+    max_payload = spacex_df['Payload Mass (kg)'].max()
+    min_payload = spacex_df['Payload Mass (kg)'].min()
+    return html.Div(children=[html.H1('SpaceX Launch Records Dashboard',
                                         style={'textAlign': 'center', 'color': '#503D36',
                                                'font-size': 40}),
                                 #addding dropdown with launch site options
                                   dcc.Dropdown(id='site-dropdown',
-                                     options=[
-                                        {'label': 'All Sites', 'value': 'ALL'},
-                                        {'label': 'CCAFS LC-40', 'value': 'CCAFS LC-40'},
-                                        {'label': 'VAFB SLC-4E', 'value': 'VAFB SLC-4E'},
-                                        {'label': 'KSC LC-39A', 'value': 'KSC LC-39A'},
-                                        {'label': 'CCAFS SLC-40', 'value': 'CCAFS SLC-40'}
-
-                                     ],
+                                     options=[{'label': 'All Sites', 'value': 'ALL'}] +
+                                             [{'label': site, 'value': site} for site in spacex_df['Launch Site'].unique()],
                                      value='ALL',
                                      placeholder="Select a Launch Site here",
                                      searchable=True
@@ -55,41 +290,83 @@ app.layout = html.Div(children=[html.H1('SpaceX Launch Records Dashboard',
                                     value=[min_payload, max_payload]),
                                 #adding scatter chart to app
                                 html.Div(dcc.Graph(id='success-payload-scatter-chart')),
- ])
+ ] + ([dcc.Store(id='launch-store', data=client_store(current_dataset()))] if CLIENTSIDE_SCATTER
+      else [dcc.Store(id='scatter-traces')]))
+
+app.layout = serve_layout
 
 #Callback function for Piechart
 @app.callback(Output(component_id='success-pie-chart', component_property='figure'),
               Input(component_id='site-dropdown', component_property='value'))
 def get_pie_chart(entered_site):
-    filtered_df = spacex_df
-    if entered_site == 'ALL':
-        fig = px.pie(spacex_df, values='class', 
-        names='Launch Site', 
-        title='Total Success Launches for all sites')
-        return fig
-    else:
-        filtered_df=spacex_df[spacex_df['Launch Site']== entered_site]
-        filtered_df=filtered_df.groupby(['Launch Site','class']).size().reset_index(name='class count')
-        fig=px.pie(filtered_df,values='class count',names='class',title=f"Total Success Launches for site {entered_site}")
-        return fig
-
-#Callback function for scatter chart
-@app.callback(Output(component_id='success-payload-scatter-chart', component_property='figure'),
-                [Input(component_id='site-dropdown', component_property='value'),
-                Input(component_id="payload-slider", component_property="value")])
-def get_scatter_chart(entered_site,payload_slider):
-    filtered_df1 = spacex_df[spacex_df['Payload Mass (kg)'].between(payload_slider[0],payload_slider[1])]
-    if entered_site == 'ALL':
-        fig1 = px.scatter(filtered_df1, x='Payload Mass (kg)',y='class',
-        color='Booster Version Category',title='Success count on Payload mass for all sites', 
-        )
-        return fig1
-    else:
-        filtered_df2=filtered_df1[filtered_df1['Launch Site']== entered_site]
-        fig1 = px.scatter(filtered_df2, x='Payload Mass (kg)',y='class',
-        color='Booster Version Category',title=f'Success count on Payload mass for Launch site {entered_site}')
-        return fig1
+    with phase('data'):
+        _, launch_index = current_launches()
+        filtered_df = site_entry(launch_index, entered_site)['pie']
+    with phase('figure'):
+        if entered_site == 'ALL':
+            fig = px.pie(filtered_df, values='class', 
+            names='Launch Site', 
+            title='Total Success Launches for all sites')
+            return fig
+        else:
+            fig=px.pie(filtered_df,values='class count',names='class',title=f"Total Success Launches for site {entered_site}")
+            return fig
+
+#Callback function for scatter chart: the figure, and the key of the binned traces it leaves
+#in the browser (kept in the scatter-traces store and passed back as shown_traces)
+def get_scatter_chart(entered_site,payload_slider,shown_traces=None):
+    dataset = current_dataset()
+    spacex_df, launch_index = launches_of(dataset)
+    entry = site_entry(launch_index, entered_site)
+    traces_key = scatter_traces_key(dataset.version if dataset else None, entered_site, entry)
+    if traces_key is not None:
+        with phase('data'):
+            traces = binned_scatter_traces(entry, payload_slider[0], payload_slider[1])
+        with phase('figure'):
+            if slider_moved() and shown_traces == traces_key:
+                return scatter_patch(traces), traces_key
+            title = ('Success count on Payload mass for all sites' if entered_site == 'ALL'
+                     else f'Success count on Payload mass for Launch site {entered_site}')
+            return binned_scatter_figure(entry, traces, title), traces_key
+    with phase('data'):
+        filtered_df1 = spacex_df.iloc[payload_rows(launch_index, entered_site, payload_slider[0], payload_slider[1])]
+    with phase('figure'):
+        if entered_site == 'ALL':
+            fig1 = px.scatter(filtered_df1, x='Payload Mass (kg)',y='class',
+            color='Booster Version Category',title='Success count on Payload mass for all sites', 
+            )
+            return fig1, traces_key
+        else:
+            fig1 = px.scatter(filtered_df1, x='Payload Mass (kg)',y='class',
+            color='Booster Version Category',title=f'Success count on Payload mass for Launch site {entered_site}')
+            return fig1, traces_key
+
+#the scatter chart runs on the server, or in the browser on the launch store (same figures)
+if CLIENTSIDE_SCATTER:
+    app.clientside_callback(SCATTER_CHART_JS,
+                            Output(component_id='success-payload-scatter-chart', component_property='figure'),
+                            [Input(component_id='site-dropdown', component_property='value'),
+                             Input(component_id="payload-slider", component_property="value"),
+                             Input(component_id='launch-store', component_property='data')])
+else:
+    app.callback([Output(component_id='success-payload-scatter-chart', component_property='figure'),
+                  Output(component_id='scatter-traces', component_property='data')],
+                 [Input(component_id='site-dropdown', component_property='value'),
+                  Input(component_id="payload-slider", component_property="value")],
+                 State(component_id='scatter-traces', component_property='data'))(get_scatter_chart)
+
+#opt-in callback timings, see dash_instrumentation (DASH_INSTRUMENTATION=1)
+instrument(app)
 
 #running the app
 if __name__ == '__main__':
-    app.run_server()
+    parser = argparse.ArgumentParser(description='SpaceX Launch Records Dashboard')
+    parser.add_argument('--publish-shared', metavar='DIR',
+                        help='Publish spacex_launch_dash.csv to DIR for workers started with SPACEX_SHARED_DIR=DIR and exit')
+    args = parser.parse_args()
+    if args.publish_shared:
+        spacex_df, launch_index = current_launches()
+        version = publish(args.publish_shared, spacex_df, launch_index_arrays(launch_index))
+        print(f'Dataset version {version} published to {args.publish_shared}')
+    else:
+        app.run_server()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional, without it every run parses the workbook
+    feather = None
+
+
+# Bump when the cleaning below changes so old caches are rebuilt
+CACHE_VERSION = 2
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _compact_ids(df, columns):
+    # Whole-number IDs become the smallest integer dtype that fits, anything else a categorical
+    for column in columns:
+        numeric = pd.to_numeric(df[column], errors='coerce')
+        if numeric.notna().all() and (numeric % 1 == 0).all():
+            df[column] = pd.to_numeric(numeric.astype('int64'), downcast='integer')
+        else:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def clean_patient_entries(df):
+    df['createdAt_time'] = pd.to_datetime(df['createdAt_time'], errors='coerce')
+    df = df.dropna(subset=['createdAt_time'])
+    return _compact_ids(df.reset_index(drop=True), ['patientId', 'entryId'])
+
+
+def clean_audit_actions(df):
+    df['timeResponded'] = pd.to_datetime(df['timeResponded'], errors='coerce')
+    df = df.dropna(subset=['patientId', 'timeResponded'])
+    # 'team name' stays plain text: as a categorical, seaborn would order the team bars by
+    # category instead of by response time
+    return _compact_ids(df.reset_index(drop=True), ['patientId'])
+
+
+def cache_workbook(path, clean, cache_dir=None, rebuild=False):
+    """Make sure the typed Feather cache of an Excel export is current and return its path.
+
+    The cache is keyed on the source path, mtime and content hash and holds the frame
+    after `clean`, so later runs memory-map it instead of parsing the workbook again.
+    """
+    if feather is None:
+        raise ImportError('pyarrow is required for the workbook cache')
+
+    path = os.path.abspath(path)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(path), '.isla_cache')
+    name = os.path.splitext(os.path.basename(path))[0]
+    data_path = os.path.join(cache_dir, name + '.feather')
+    meta_path = os.path.join(cache_dir, name + '.json')
+
+    stat = os.stat(path)
+    key = {'version': CACHE_VERSION, 'clean': clean.__name__, 'path': path,
+           'mtime': stat.st_mtime, 'size': stat.st_size}
+
+    if not rebuild and os.path.exists(data_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            cached = json.load(f)
+        stored_hash = cached.pop('hash', None)
+        if cached == key:
+            return data_path
+        if {k: v for k, v in cached.items() if k != 'mtime'} == {k: v for k, v in key.items() if k != 'mtime'}:
+            # Only the mtime moved (copied or touched file), trust the content hash instead
+            if stored_hash == _file_hash(path):
+                _write_json(meta_path, dict(key, hash=stored_hash))
+                return data_path
+
+    df = clean(pd.read_excel(path))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = data_path + '.tmp'
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, data_path)
+    _write_json(meta_path, dict(key, hash=_file_hash(path)))
+    return data_path
+
+
+def load_workbook(path, clean, cache_dir=None, rebuild=False):
+    """Read an Excel export through the Feather cache (see `cache_workbook`)."""
+    if feather is None:
+        return clean(pd.read_excel(path))
+    try:
+        data_path = cache_workbook(path, clean, cache_dir=cache_dir, rebuild=rebuild)
+    except OSError:
+        # The cache is only a speed-up: without a writable cache dir, parse the workbook
+        return clean(pd.read_excel(path))
+    return feather.read_table(data_path, memory_map=True).to_pandas(split_blocks=True)
+
+
+def _write_json(path, payload):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from isla_metrics import (combine_partials, finish_summary, histogram_of_sorted, median_of_sorted, partial_summary,
+                          submission_groups)
+from isla_pipeline import match_closest_responses, remove_near_duplicates
+
+
+# Bump when the layout of the saved state changes so old state is rebuilt
+STATE_VERSION = 4
+
+# Sorted response times (all, and since the cutoff) for the medians and the histogram; they
+# grow with every matched entry so they are kept next to the pickle as .npy files
+SORTED_ARRAYS = ['response_time', 'response_time_since_cutoff']
+
+
+def _empty_state(entries, audit_actions, threshold, cutoff, outlier_threshold):
+    return {
+        'version': STATE_VERSION,
+        'settings': {'threshold': threshold, 'cutoff': cutoff, 'outlier_threshold': outlier_threshold},
+        # How many cleaned rows of each export have been processed already
+        'entries_seen': 0,
+        'audits_seen': 0,
+        # Latest entry per patient, for the near-duplicate window, and latest audit action per patient
+        'last_seen': pd.DataFrame({'patientId': entries['patientId'].iloc[:0],
+                                   'createdAt_time': entries['createdAt_time'].iloc[:0]}),
+        'latest_audits': pd.DataFrame({'patientId': audit_actions['patientId'].iloc[:0],
+                                       'timeResponded': audit_actions['timeResponded'].iloc[:0]}),
+        # Kept entries with no response yet, and audit actions a future entry could still match
+        'open_entries': entries.iloc[:0],
+        'pending_audits': audit_actions.iloc[:0],
+        # Running sums/counts, distinct entries per patient and every response time (sorted)
+        'partial': None,
+        'submission_counts': pd.Series(dtype='int64'),
+        'response_time': np.empty(0),
+        'response_time_since_cutoff': np.empty(0),
+    }
+
+
+def _array_path(path, name):
+    return f'{path}.{name}.npy'
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    state = pd.read_pickle(path)
+    if state.get('version') != STATE_VERSION:
+        return None
+    for name in SORTED_ARRAYS:
+        array_path = _array_path(path, name)
+        if not os.path.exists(array_path):
+            return None
+        state[name] = np.load(array_path)
+        # An array from another save (interrupted before the pickle was replaced)
+        if len(state[name]) != state['sizes'][name]:
+            return None
+    return state
+
+
+def save_state(state, path):
+    # The arrays go first; the pickle records their sizes so a mismatched pair is rebuilt
+    for name in SORTED_ARRAYS:
+        tmp_path = _array_path(path, name) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, state[name])
+        os.replace(tmp_path, _array_path(path, name))
+    pickled = {key: value for key, value in state.items() if key not in SORTED_ARRAYS}
+    pickled['sizes'] = {name: len(state[name]) for name in SORTED_ARRAYS}
+    tmp_path = path + '.tmp'
+    pd.to_pickle(pickled, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def merge_sorted(ordered, values):
+    """`ordered` with `values` merged in, still sorted; linear in the size of `ordered`."""
+    values = np.sort(values)
+    return np.insert(ordered, np.searchsorted(ordered, values, side='right'), values)
+
+
+def update(state, entries, audit_actions):
+    """Fold the rows of the exports that the state has not seen yet into it.
+
+    `entries` and `audit_actions` are the full cleaned exports; exports are expected to only
+    grow by appending newer rows; anything else needs a full rebuild.
+    """
+    settings = state['settings']
+    new_entries = entries.iloc[state['entries_seen']:]
+    new_audits = audit_actions.iloc[state['audits_seen']:]
+    if len(entries) < state['entries_seen'] or len(audit_actions) < state['audits_seen']:
+        raise ValueError('export is shorter than the saved state, rebuild it')
+    # Only the order within a patient matters: audits of different patients may interleave
+    previous = new_audits.merge(state['latest_audits'], on='patientId', how='inner', suffixes=('', '_previous'))
+    if (previous['timeResponded'] < previous['timeResponded_previous']).any():
+        raise ValueError('new audit actions are older than ones already processed, rebuild the state')
+
+    last_seen = state['last_seen']
+    previous = new_entries.merge(last_seen, on='patientId', how='inner', suffixes=('', '_previous'))
+    if (previous['createdAt_time'] < previous['createdAt_time_previous']).any():
+        raise ValueError('new entries are older than ones already processed, rebuild the state')
+
+    # Near-duplicates are judged against the patient's latest entry from earlier runs too
+    kept = remove_near_duplicates(new_entries, settings['threshold'], last_seen)
+    last_seen = pd.concat([last_seen, new_entries[['patientId', 'createdAt_time']]], ignore_index=True)
+    last_seen = last_seen.sort_values('createdAt_time', kind='stable').drop_duplicates('patientId', keep='last')
+
+    # Open entries can only be answered by new audit actions; new entries may also be
+    # answered by audit actions left over from earlier runs
+    candidates = pd.concat([state['open_entries'], kept], ignore_index=True)
+    audits = pd.concat([state['pending_audits'], new_audits], ignore_index=True)
+    closest = match_closest_responses(candidates, audits)
+
+    state['open_entries'] = candidates[~candidates['entryId'].isin(closest['entryId'])]
+    # Future entries are never older than the latest entry of their patient
+    floor = audits[['patientId']].merge(last_seen, on='patientId', how='left')['createdAt_time']
+    state['pending_audits'] = audits[(floor.isna() | (audits['timeResponded'] >= floor)).to_numpy()]
+    state['last_seen'] = last_seen.reset_index(drop=True)
+    state['entries_seen'], state['audits_seen'] = len(entries), len(audit_actions)
+    latest_audits = pd.concat([state['latest_audits'], new_audits[['patientId', 'timeResponded']]], ignore_index=True)
+    state['latest_audits'] = latest_audits.sort_values('timeResponded', kind='stable') \
+        .drop_duplicates('patientId', keep='last').reset_index(drop=True)
+
+    if len(closest):
+        partial = partial_summary(closest, settings['cutoff'], settings['outlier_threshold'])
+        state['partial'] = partial if state['partial'] is None else combine_partials([state['partial'], partial])
+        counts = closest.groupby('patientId', observed=True)['entryId'].nunique()
+        state['submission_counts'] = state['submission_counts'].add(counts, fill_value=0).astype('int64')
+        values = closest['Response_time'].to_numpy(dtype=float)
+        since_cutoff = (closest['createdAt_time'] >= settings['cutoff']).to_numpy()
+        state['response_time'] = merge_sorted(state['response_time'], values)
+        state['response_time_since_cutoff'] = merge_sorted(state['response_time_since_cutoff'], values[since_cutoff])
+    return state
+
+
+def incremental_summary(state_path, entries, audit_actions, threshold, cutoff, outlier_threshold, rebuild=False):
+    """Report tables kept up to date from the rows added since the previous run.
+
+    The state saved at `state_path` is thrown away and rebuilt from every row when `rebuild`
+    is set, when it was written by another version or when the settings changed.
+    """
+    settings = {'threshold': threshold, 'cutoff': cutoff, 'outlier_threshold': outlier_threshold}
+    state = None if rebuild else load_state(state_path)
+    if state is None or state['settings'] != settings:
+        state = _empty_state(entries, audit_actions, threshold, cutoff, outlier_threshold)
+    state = update(state, entries, audit_actions)
+    save_state(state, state_path)
+
+    if state['partial'] is None:
+        raise ValueError('no entry was matched to an audit action')
+    partial = dict(state['partial'], submission_groups=submission_groups(state['submission_counts']))
+    ordered = state['response_time']
+    return finish_summary(partial, median_of_sorted(ordered), median_of_sorted(state['response_time_since_cutoff']),
+                          histogram_of_sorted(ordered), cutoff)
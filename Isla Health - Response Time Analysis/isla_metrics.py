@@ -0,0 +1,229 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from isla_sketch import RELATIVE_ACCURACY, build_sketches, group_quantiles, merge_sketches
+
+
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SUBMISSION_BINS = [0, 5, 10, 20, 50, 100]
+SUBMISSION_LABELS = ['1-5', '6-10', '11-20', '21-50', '51-100']
+HISTOGRAM_BINS = 1000
+PERCENTILES = [0.5, 0.9, 0.99]
+
+# Columns the report can be grouped by, derived from the closest responses
+DIMENSIONS = {
+    'team name': lambda closest: closest['team name'],
+    'day_of_week': lambda closest: pd.Categorical.from_codes(closest['createdAt_time'].dt.dayofweek,
+                                                             categories=DAYS_ORDER),
+    'year_month': lambda closest: closest['createdAt_time'].dt.to_period('M'),
+}
+
+# How the keys of a dimension are shown in the finished tables (as they are otherwise)
+DIMENSION_LABELS = {
+    'day_of_week': lambda keys: pd.Categorical(keys, categories=DAYS_ORDER, ordered=True),
+    'year_month': lambda keys: keys.astype(str),
+}
+
+# One report table: mean response time per combination of `dimensions`, optionally only
+# over entries created on or after the cutoff. Tables come out in key order, or from the
+# fastest group to the slowest with `by_mean`.
+GroupSpec = namedtuple('GroupSpec', ['name', 'dimensions', 'since_cutoff', 'by_mean'], defaults=[False, False])
+
+# Every spec is reported under its name; a new breakdown (say team by month) is one more spec
+REPORT_SPECS = [
+    GroupSpec('team', ('team name',), by_mean=True),
+    GroupSpec('team_since_cutoff', ('team name',), since_cutoff=True, by_mean=True),
+    GroupSpec('day_of_week', ('day_of_week',)),
+    GroupSpec('month', ('year_month',)),
+]
+
+# Percentile tables, read off the response time sketches
+PERCENTILE_SPECS = [
+    GroupSpec('team', ('team name',)),
+    GroupSpec('day_of_week', ('day_of_week',)),
+    GroupSpec('month', ('year_month',)),
+]
+
+
+def _factorize(closest, dimensions):
+    keys = [DIMENSIONS[dimension](closest) for dimension in dimensions]
+    if len(keys) == 1:
+        codes, uniques = pd.factorize(keys[0], sort=True)
+        return codes, pd.Index(uniques, name=dimensions[0])
+    codes, uniques = pd.MultiIndex.from_arrays(keys).factorize(sort=True)
+    return codes, uniques.set_names(list(dimensions))
+
+
+def grouped_sums(closest, since_cutoff, specs=REPORT_SPECS):
+    """Response time sum and count per group for every spec.
+
+    Each distinct set of dimensions is factorized once and reduced with a single bincount
+    pass; specs restricted to the cutoff reuse those codes with the cutoff as a mask.
+    """
+    values = closest['Response_time'].to_numpy(dtype=float)
+    since_cutoff = np.asarray(since_cutoff, dtype=bool)
+    tables = {}
+    for dimensions in dict.fromkeys(spec.dimensions for spec in specs):
+        codes, uniques = _factorize(closest, dimensions)
+        valid = codes >= 0
+        for spec in specs:
+            if spec.dimensions != dimensions:
+                continue
+            keep = valid & since_cutoff if spec.since_cutoff else valid
+            count = np.bincount(codes[keep], minlength=len(uniques))
+            total = np.bincount(codes[keep], weights=values[keep], minlength=len(uniques))
+            table = pd.DataFrame({'sum': total, 'count': count}, index=uniques)
+            tables[spec.name] = table[table['count'] > 0]
+    return tables
+
+
+def percentile_tables(sketches, start=None, end=None, specs=PERCENTILE_SPECS, percentiles=PERCENTILES,
+                      relative_accuracy=RELATIVE_ACCURACY):
+    """Response time percentiles per group for entries created in [start, end), from sketches.
+
+    Only the merged sketches are read, so any date range is answered without the raw
+    responses; every value is within `relative_accuracy` of the exact percentile as
+    np.quantile computes it (linear interpolation).
+    """
+    keys = sketches.index.to_frame(index=False).rename(columns={'date': 'createdAt_time'})
+    keep = np.ones(len(keys), dtype=bool)
+    if start is not None:
+        keep &= (keys['createdAt_time'] >= start).to_numpy()
+    if end is not None:
+        keep &= (keys['createdAt_time'] < end).to_numpy()
+    keys, counts = keys[keep], sketches.to_numpy()[keep]
+    columns = [f'p{percentile * 100:g}' for percentile in percentiles]
+    tables = {}
+    for spec in specs:
+        codes, uniques = _factorize(keys, spec.dimensions)
+        values = group_quantiles(codes, len(uniques), keys['bucket'].to_numpy(), counts, percentiles,
+                                 relative_accuracy)
+        tables[spec.name] = pd.DataFrame(values, index=uniques, columns=columns).reset_index()
+    return tables
+
+
+def overall_sums(values, outlier_threshold, where=None):
+    """Count, sum, min, max and outliers of `values`, restricted to the `where` mask if given."""
+    if where is None:
+        where = np.ones(len(values), dtype=bool)
+    count = int(np.count_nonzero(where))
+    return pd.Series({'count': count, 'sum': np.sum(values, where=where),
+                      'min': np.min(values, where=where, initial=np.inf) if count else np.nan,
+                      'max': np.max(values, where=where, initial=-np.inf) if count else np.nan,
+                      'outliers': int(np.count_nonzero((values > outlier_threshold) & where))})
+
+
+def sorted_medians(values, since_cutoff):
+    """Exact overall and since-cutoff medians read off one shared sorted order."""
+    order = np.argsort(values, kind='stable')
+    ordered = values[order]
+    return median_of_sorted(ordered), median_of_sorted(ordered[since_cutoff[order]])
+
+
+def median_of_sorted(ordered):
+    if not len(ordered):
+        return np.nan
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def histogram_of_sorted(ordered, bins=HISTOGRAM_BINS):
+    """np.histogram(ordered, bins) read off the sorted values, in O(bins log n)."""
+    # Same edges as np.histogram (they only depend on the min and max); a value counts in the
+    # bin whose left edge it reaches, the last bin also takes the values equal to its right edge
+    edges = np.histogram_bin_edges(ordered[[0, -1]], bins=bins)
+    starts = np.searchsorted(ordered, edges[:-1], side='left')
+    return np.diff(np.append(starts, len(ordered))), edges
+
+
+def submission_groups(submission_counts):
+    """Patients per submission-count bucket (1-5, 6-10, ..., 51-100)."""
+    groups = pd.cut(submission_counts, bins=SUBMISSION_BINS, labels=SUBMISSION_LABELS).rename('submission_group')
+    return groups.value_counts().sort_index()
+
+
+def partial_summary(closest, cutoff, outlier_threshold, specs=REPORT_SPECS):
+    """Additive sums/counts behind the report, for one set of closest responses.
+
+    Partials of disjoint sets of patients can be combined with `combine_partials`.
+    """
+    values = closest['Response_time'].to_numpy(dtype=float)
+    since_cutoff = (closest['createdAt_time'] >= cutoff).to_numpy()
+
+    submission_counts = closest.groupby('patientId', observed=True)['entryId'].nunique()
+
+    partial = grouped_sums(closest, since_cutoff, specs)
+    partial['overall'] = overall_sums(values, outlier_threshold)
+    partial['since_cutoff'] = overall_sums(values, outlier_threshold, where=since_cutoff)
+    partial['submission_groups'] = submission_groups(submission_counts)
+    partial['sketches'] = build_sketches(closest)
+    return partial
+
+
+def combine_partials(partials, specs=REPORT_SPECS):
+    combined = {}
+    for spec in specs:
+        tables = pd.concat([partial[spec.name] for partial in partials])
+        combined[spec.name] = tables.groupby(level=list(range(tables.index.nlevels)), observed=True).sum()
+    for name in ['overall', 'since_cutoff']:
+        frame = pd.DataFrame([partial[name] for partial in partials])
+        combined[name] = pd.Series({'count': frame['count'].sum(), 'sum': frame['sum'].sum(),
+                                    'min': frame['min'].min(), 'max': frame['max'].max(),
+                                    'outliers': frame['outliers'].sum()})
+    combined['submission_groups'] = sum(partial['submission_groups'] for partial in partials)
+    combined['sketches'] = merge_sketches(partial['sketches'] for partial in partials)
+    return combined
+
+
+def group_means(table):
+    """Mean response time per group from a sum/count table, keys as columns."""
+    return (table['sum'] / table['count']).rename('Response_time').reset_index()
+
+
+def _labelled(table, dimensions):
+    for dimension in dimensions:
+        if dimension in DIMENSION_LABELS:
+            table[dimension] = DIMENSION_LABELS[dimension](table[dimension])
+    return table
+
+
+def finish_summary(partial, median, median_since_cutoff, histogram, cutoff, specs=REPORT_SPECS,
+                   percentile_specs=PERCENTILE_SPECS):
+    """Turn combined partials plus the order statistics into the report tables."""
+    def key_metrics(overall, median):
+        count = overall['count']
+        return {'mean': overall['sum'] / count if count else np.nan, 'median': median,
+                'max': overall['max'], 'min': overall['min'], 'outliers': int(overall['outliers'])}
+
+    summary = {}
+    for spec in specs:
+        table = _labelled(group_means(partial[spec.name]), spec.dimensions)
+        by = 'Response_time' if spec.by_mean else list(spec.dimensions)
+        summary[spec.name] = table.sort_values(by=by, kind='stable')
+
+    percentiles = percentile_tables(partial['sketches'], specs=percentile_specs)
+    for spec in percentile_specs:
+        _labelled(percentiles[spec.name], spec.dimensions)
+
+    return {
+        **summary,
+        'overall': key_metrics(partial['overall'], median),
+        'since_cutoff': key_metrics(partial['since_cutoff'], median_since_cutoff),
+        'submission_groups': partial['submission_groups'],
+        'histogram': histogram,
+        'percentiles': percentiles,
+        'sketches': partial['sketches'],
+        'cutoff': cutoff,
+    }
+
+
+def summarise(closest, cutoff, outlier_threshold, specs=REPORT_SPECS):
+    """Report tables for closest responses that fit in memory."""
+    values = closest['Response_time'].to_numpy(dtype=float)
+    since_cutoff = (closest['createdAt_time'] >= cutoff).to_numpy()
+    histogram = np.histogram(values, bins=HISTOGRAM_BINS) if len(values) else None
+    median, median_since_cutoff = sorted_medians(values, since_cutoff)
+    return finish_summary(partial_summary(closest, cutoff, outlier_threshold, specs), median, median_since_cutoff,
+                          histogram, cutoff, specs)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+def _nanoseconds(times):
+    # Bring both timestamp columns to the same unit before comparing raw integers
+    return times.astype('datetime64[ns]').to_numpy().view('int64')
+
+
+def remove_near_duplicates(entries, threshold, last_seen=None):
+    """Keep only the first entry of each burst of submissions by the same patient.
+
+    An entry is dropped when it comes within `threshold` of the patient's previous entry.
+    `last_seen` (patientId, createdAt_time) carries the latest entry per patient from
+    earlier batches, so a burst that straddles two exports is still caught.
+    """
+    if last_seen is None:
+        # Sort by patientId and createdAt_time and compare consecutive entries per patient
+        entries = entries.sort_values(by=['patientId', 'createdAt_time'])
+        time_diff = entries.groupby('patientId', observed=True)['createdAt_time'].diff()
+        return entries[time_diff.isna() | (time_diff > threshold)].copy()
+
+    # Same comparison with the earlier entries slotted in ahead of the new ones (row -1)
+    timeline = pd.concat([
+        pd.DataFrame({'patientId': last_seen['patientId'].to_numpy(),
+                      'createdAt_time': last_seen['createdAt_time'].to_numpy(), 'row': -1}),
+        pd.DataFrame({'patientId': entries['patientId'].to_numpy(),
+                      'createdAt_time': entries['createdAt_time'].to_numpy(), 'row': np.arange(len(entries))}),
+    ], ignore_index=True)
+    timeline = timeline.sort_values(by=['patientId', 'createdAt_time'], kind='stable')
+    time_diff = timeline.groupby('patientId', observed=True)['createdAt_time'].diff()
+    keep = (timeline['row'] >= 0) & (time_diff.isna() | (time_diff > threshold))
+    return entries.iloc[timeline.loc[keep, 'row'].to_numpy()].copy()
+
+
+def match_closest_responses(entries, audit_actions):
+    """Pair every entry with the earliest audit action at or after it for the same patient.
+
+    Equivalent to merging on patientId, keeping timeResponded >= createdAt_time and taking
+    the smallest Response_time per entryId, but done as a sorted forward as-of search so the
+    patient x audit cross product is never built.
+    """
+    entries = entries.reset_index(drop=True)
+    audit_actions = audit_actions.reset_index(drop=True)
+    n_entries = len(entries)
+
+    # Shared integer codes for patientId so both sides can be sorted on one key
+    codes, _ = pd.factorize(pd.concat([entries['patientId'], audit_actions['patientId']], ignore_index=True))
+    entry_codes, audit_codes = codes[:n_entries], codes[n_entries:]
+
+    # Stack entries and audit actions into one timeline. At equal (patient, time) the entry
+    # sorts first so that a response at exactly createdAt_time still counts, and ties between
+    # audit actions keep their original order (the merge path keeps the first one as well).
+    times = np.concatenate([_nanoseconds(entries['createdAt_time']), _nanoseconds(audit_actions['timeResponded'])])
+    is_audit = np.concatenate([np.zeros(n_entries, dtype=np.int8), np.ones(len(audit_actions), dtype=np.int8)])
+    row = np.arange(len(times))
+    order = np.lexsort((row, is_audit, times, codes))
+
+    # For every slot in the timeline, the position of the next audit action at or after it
+    sorted_is_audit = is_audit[order].astype(bool)
+    next_audit = np.where(sorted_is_audit, np.arange(len(order)), len(order))
+    next_audit = np.minimum.accumulate(next_audit[::-1])[::-1]
+
+    entry_slots = np.flatnonzero(~sorted_is_audit)
+    entry_rows = order[entry_slots]
+    candidate = next_audit[entry_slots]
+    has_next = candidate < len(order)
+    audit_rows = np.full(len(entry_slots), -1)
+    audit_rows[has_next] = order[candidate[has_next]] - n_entries
+
+    # The next audit action in the timeline must belong to the same patient, and a missing
+    # createdAt_time / patientId can never match (the merge path drops those rows too)
+    matched = has_next.copy()
+    matched[has_next] = audit_codes[audit_rows[has_next]] == entry_codes[entry_rows[has_next]]
+    matched &= entry_codes[entry_rows] != -1
+    matched &= ~entries['createdAt_time'].isna().to_numpy()[entry_rows]
+
+    # Restore the original entry order before assembling the output
+    entry_rows, audit_rows = entry_rows[matched], audit_rows[matched]
+    by_entry = np.argsort(entry_rows, kind='stable')
+    entry_rows, audit_rows = entry_rows[by_entry], audit_rows[by_entry]
+
+    left = entries.iloc[entry_rows].reset_index(drop=True)
+    right = audit_actions.drop(columns=['patientId']).iloc[audit_rows].reset_index(drop=True)
+    closest = left.join(right, lsuffix='_x', rsuffix='_y')
+    closest['Response_time'] = (closest['timeResponded'] - closest['createdAt_time']) / pd.Timedelta(days=1)
+
+    # Same ordering and entryId de-duplication as the merge path
+    closest = closest.sort_values(by=['patientId', 'entryId', 'Response_time'], kind='stable')
+    return closest.drop_duplicates(subset=['entryId'], keep='first')
+
@@ -0,0 +1,117 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from isla_metrics import REPORT_SPECS
+
+
+def _label_bars(ax, offset):
+    for p in ax.patches:
+        ax.text(p.get_x() + p.get_width() / 2,      # X-coordinate: center of the bar
+                p.get_height() + offset,            # Y-coordinate: slightly above the top of the bar
+                f'{p.get_height():.2f}',            # The value (height) of the bar
+                ha="center")                        # Horizontally center the text
+
+
+def draw_team_bar(ax, table, title):
+    sns.barplot(x='team name', y='Response_time', hue='team name', palette='dark:orange', data=table, ax=ax)
+    _label_bars(ax, 0.7)
+    ax.set_title(title)
+    ax.set_xlabel('Team Name')
+    ax.set_ylabel('Average Response Time (Days)')
+    ax.tick_params(axis='x', labelrotation=45)
+
+
+def draw_histogram(ax, histogram, title):
+    # Drawn from the pre-binned counts, the raw response vector never reaches matplotlib
+    counts, edges = histogram
+    sns.histplot(x=edges[:-1], weights=counts, bins=list(edges), kde=False, color='orange', ax=ax)
+    ax.set_xscale('log')  # Logarithmic scale for skewed data
+    ax.set_title(title)
+    ax.set_xlabel('Response Time (Days)')
+    ax.set_ylabel('Frequency')
+
+
+def draw_day_of_week_bar(ax, table, title):
+    sns.barplot(x='day_of_week', y='Response_time', hue='day_of_week', palette='dark:orange', data=table, ax=ax)
+    _label_bars(ax, 0.05)
+    ax.set_title(title)
+    ax.set_xlabel('Day of the Week')
+    ax.set_ylabel('Average Response Time (Days)')
+
+
+def draw_monthly_line(ax, table, title):
+    sns.lineplot(data=table, x='year_month', y='Response_time', marker='o', color='orange', ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel('Month-Year')
+    ax.set_ylabel('Average Response Time (Days)')
+    ax.tick_params(axis='x', labelrotation=45)
+
+
+# (figure number, file name, summary table, draw function, title); {cutoff} in a title is
+# filled in from the summary's cutoff date
+FIGURES = [
+    (1, 'team_response_time', 'team', draw_team_bar, 'Average Response Time by Team (in Days)'),
+    (2, 'response_time_distribution', 'histogram', draw_histogram, 'Distribution of Response Times (in Days)'),
+    (3, 'day_of_week_response_time', 'day_of_week', draw_day_of_week_bar, 'Average Response Time by Day of the Week'),
+    (4, 'monthly_response_time', 'month', draw_monthly_line, 'Average Response Time Trends Over Time (Monthly)'),
+    (5, 'team_response_time_since_cutoff', 'team_since_cutoff', draw_team_bar,
+     'Average Response Time by Team (in Days) - From {cutoff}'),
+]
+
+
+def _title(title, summary):
+    cutoff = summary['cutoff']
+    return title.format(cutoff=f'{cutoff:%B %Y}' if cutoff.day == 1 else f'{cutoff:%d %B %Y}')
+
+
+def show_figures(summary):
+    """Draw every figure on the current pyplot backend (figures 1-5 as in the original script)."""
+    for number, _, key, draw, title in FIGURES:
+        _, ax = plt.subplots(num=number, figsize=(10, 6))
+        draw(ax, summary[key], _title(title, summary))
+
+
+def _render(number, name, draw, table, title, out_dir, formats):
+    # Runs in a worker process: a bare Figure on the Agg backend never touches a GUI
+    matplotlib.use('Agg')
+    started = time.perf_counter()
+    fig = Figure(figsize=(10, 6))
+    draw(fig.subplots(), table, title)
+    fig.tight_layout()
+    for fmt in formats:
+        fig.savefig(os.path.join(out_dir, f'{number}_{name}.{fmt}'), format=fmt)
+    return name, time.perf_counter() - started
+
+
+def write_tables(summary, out_dir):
+    for spec in REPORT_SPECS:
+        summary[spec.name].to_csv(os.path.join(out_dir, f'{spec.name}.csv'), index=False)
+    counts, edges = summary['histogram']
+    pd.DataFrame({'bin_start': edges[:-1], 'bin_end': edges[1:], 'count': counts}).to_csv(
+        os.path.join(out_dir, 'histogram.csv'), index=False)
+    pd.DataFrame({'all': summary['overall'], 'since_cutoff': summary['since_cutoff']}).to_csv(
+        os.path.join(out_dir, 'key_metrics.csv'), index_label='metric')
+    summary['submission_groups'].rename('patients').to_csv(os.path.join(out_dir, 'submission_groups.csv'))
+    for name, table in summary['percentiles'].items():
+        table.to_csv(os.path.join(out_dir, f'percentiles_{name}.csv'), index=False)
+
+
+def write_report(summary, out_dir, formats=('png', 'svg'), max_workers=None):
+    """Render every figure headlessly in a process pool and write the tables next to them.
+
+    Each figure only needs its own small aggregate table, so they are rendered side by side
+    and the report takes about as long as the slowest figure. Returns seconds per figure.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max_workers or len(FIGURES)) as pool:
+        futures = [pool.submit(_render, number, name, draw, summary[key], _title(title, summary), out_dir, formats)
+                   for number, name, key, draw, title in FIGURES]
+        write_tables(summary, out_dir)
+        return dict(future.result() for future in futures)
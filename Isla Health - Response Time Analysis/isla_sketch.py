@@ -0,0 +1,99 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Quantiles read off a sketch are within this relative error of the exact value (DDSketch:
+# every value falls in a logarithmic bucket [gamma^(k-1), gamma^k] and is estimated by the
+# bucket's midpoint in relative terms)
+RELATIVE_ACCURACY = 0.01
+# Zero (and any non-positive) response time has no logarithm; it gets its own bucket
+ZERO_BUCKET = np.iinfo(np.int32).min
+
+
+def _log_gamma(relative_accuracy):
+    return np.log((1 + relative_accuracy) / (1 - relative_accuracy))
+
+
+def bucket_of(values, relative_accuracy=RELATIVE_ACCURACY):
+    positive = values > 0
+    buckets = np.ceil(np.log(np.where(positive, values, 1)) / _log_gamma(relative_accuracy))
+    return np.where(positive, buckets, ZERO_BUCKET).astype(np.int32)
+
+
+def bucket_value(buckets, relative_accuracy=RELATIVE_ACCURACY):
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    values = 2 * np.power(gamma, buckets.astype(float)) / (gamma + 1)
+    return np.where(buckets == ZERO_BUCKET, 0.0, values)
+
+
+def build_sketches(closest, relative_accuracy=RELATIVE_ACCURACY):
+    """Response time counts per (entry date, team, log bucket) for a set of closest responses.
+
+    Sketches of any sets of responses combine with `merge_sketches` into the sketch of their
+    union, so they can be built per partition or per run and added up later.
+    """
+    keys = pd.DataFrame({
+        'date': closest['createdAt_time'].dt.normalize(),
+        'team name': closest['team name'],
+        'bucket': bucket_of(closest['Response_time'].to_numpy(dtype=float), relative_accuracy),
+    })
+    return keys.groupby(['date', 'team name', 'bucket'], observed=True).size().rename('count')
+
+
+def merge_sketches(sketches):
+    sketches = pd.concat(list(sketches))
+    return sketches.groupby(level=['date', 'team name', 'bucket'], observed=True).sum()
+
+
+def group_quantiles(codes, n_groups, buckets, counts, quantiles, relative_accuracy=RELATIVE_ACCURACY):
+    """Quantiles of every group from sketch rows labelled with group codes (-1 for none).
+
+    Like np.quantile (linear interpolation), the q-quantile of a group interpolates between
+    its values of rank floor(q * (n - 1)) and ceil(q * (n - 1)), each read off the bucket
+    holding it. Both are within `relative_accuracy` of the value they stand for, and so is
+    the interpolation, since response times are never negative. The ranks are found with
+    one sort and binary searches for all groups at once.
+    """
+    order = np.lexsort((buckets, codes))
+    codes, buckets, cumulative = codes[order], buckets[order], np.cumsum(counts[order])
+    groups = np.arange(n_groups)
+    first = np.searchsorted(codes, groups, side='left')
+    last = np.searchsorted(codes, groups, side='right') - 1
+    before = np.where(first > 0, cumulative[np.maximum(first - 1, 0)], 0)
+    total = cumulative[last] - before
+
+    def value_of_rank(rank):
+        position = np.searchsorted(cumulative, before + rank, side='right')
+        return bucket_value(buckets[position], relative_accuracy)
+
+    result = np.empty((n_groups, len(quantiles)))
+    for column, quantile in enumerate(quantiles):
+        rank = quantile * (total - 1)
+        lower, upper = value_of_rank(np.floor(rank)), value_of_rank(np.ceil(rank))
+        result[:, column] = lower + (rank - np.floor(rank)) * (upper - lower)
+    return result
+
+
+def save_sketches(sketches, path, relative_accuracy=RELATIVE_ACCURACY):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(sketches.reset_index(), preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           b'isla_sketch': json.dumps({'relative_accuracy': relative_accuracy})})
+    tmp_path = path + '.tmp'
+    feather.write_feather(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_sketches(path):
+    """Saved sketches and the relative accuracy they were built with."""
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path)
+    settings = json.loads(table.schema.metadata[b'isla_sketch'])
+    sketches = table.to_pandas().set_index(['date', 'team name', 'bucket'])['count']
+    return sketches, settings['relative_accuracy']
@@ -0,0 +1,165 @@
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.ipc
+
+from isla_cache import cache_workbook, clean_audit_actions, clean_patient_entries
+from isla_metrics import HISTOGRAM_BINS, combine_partials, finish_summary, partial_summary
+from isla_pipeline import match_closest_responses, remove_near_duplicates
+
+
+# Number of fine bins used to narrow down the exact median before loading any values
+MEDIAN_BINS = 1 << 16
+
+
+def _partition_of(patient_ids, n_partitions):
+    # The cache picks the patientId dtype of each export on its own (int16 in one, float
+    # categories in another when an ID is missing), so hash a key both sides agree on:
+    # numeric IDs as float64, anything else as its text
+    values = patient_ids.to_numpy()
+    if values.dtype.kind in 'iuf':
+        numeric = values.astype(float)
+    else:
+        values = values.astype(object)
+        numeric = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+    hashes = pd.util.hash_array(numeric)
+    text = np.isnan(numeric)
+    if text.any():
+        hashes[text] = pd.util.hash_array(values[text].astype(str).astype(object))
+    return hashes % n_partitions
+
+
+def _partition_to_disk(cache_paths, n_partitions, out_dir):
+    """Split cached exports into patient partitions, one record batch in memory at a time."""
+    for source, cache_path in enumerate(cache_paths):
+        reader = pa.ipc.open_file(pa.memory_map(cache_path))
+        for batch_number in range(reader.num_record_batches):
+            batch = reader.get_batch(batch_number).to_pandas()
+            partitions = _partition_of(batch['patientId'], n_partitions)
+            for partition, rows in batch.groupby(partitions):
+                part_dir = os.path.join(out_dir, str(partition))
+                os.makedirs(part_dir, exist_ok=True)
+                name = f'{source}_{batch_number}.feather'
+                feather.write_feather(rows.reset_index(drop=True), os.path.join(part_dir, name),
+                                      compression='uncompressed')
+
+
+def _read_partition(root, partition):
+    part_dir = os.path.join(root, str(partition))
+    if not os.path.isdir(part_dir):
+        return None
+    frames = [feather.read_feather(os.path.join(part_dir, name)) for name in sorted(os.listdir(part_dir))]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _fine_bin(values, lo, hi):
+    if hi == lo:
+        return np.zeros(len(values), dtype=np.int64)
+    scaled = (values - lo) / (hi - lo) * MEDIAN_BINS
+    return np.clip(scaled.astype(np.int64), 0, MEDIAN_BINS - 1)
+
+
+def _spilled_median(spill_paths, mask_name, lo, hi, count):
+    """Exact median of spilled response times without loading them all at once."""
+    if not count:
+        return np.nan
+
+    def spilled():
+        for path in spill_paths:
+            with np.load(path) as spill:
+                values = spill['Response_time']
+                yield values if mask_name is None else values[spill[mask_name]]
+
+    # First pass: counts per fine bin tell which bins hold the middle order statistics
+    bin_counts = np.zeros(MEDIAN_BINS, dtype=np.int64)
+    for values in spilled():
+        bin_counts += np.bincount(_fine_bin(values, lo, hi), minlength=MEDIAN_BINS)
+    cumulative = np.cumsum(bin_counts)
+    ranks = sorted({(count - 1) // 2, count // 2})
+    wanted = np.searchsorted(cumulative, np.array(ranks), side='right')
+
+    # Second pass: keep only the values inside those bins and select from them
+    keep = [values[np.isin(_fine_bin(values, lo, hi), wanted)] for values in spilled()]
+    candidates = np.sort(np.concatenate(keep))
+    first_bin = wanted.min()
+    offset = cumulative[first_bin - 1] if first_bin else 0
+    return float(np.mean([candidates[rank - offset] for rank in ranks]))
+
+
+def _spilled_histogram(spill_paths, lo, hi):
+    edges = np.histogram_bin_edges(np.array([lo, hi]), bins=HISTOGRAM_BINS)
+    counts = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    for path in spill_paths:
+        with np.load(path) as spill:
+            counts += np.histogram(spill['Response_time'], bins=edges)[0]
+    return counts, edges
+
+
+def _summarise_partition(work_dir, partition, threshold, cutoff, outlier_threshold):
+    # Runs in a worker process when partitions are processed in parallel; everything it
+    # returns is small apart from the response times, which go to a spill file
+    entries = _read_partition(os.path.join(work_dir, 'entries'), partition)
+    audits = _read_partition(os.path.join(work_dir, 'audits'), partition)
+    if entries is None or audits is None:
+        return None
+    closest = match_closest_responses(remove_near_duplicates(entries, threshold), audits)
+    if closest.empty:
+        return None
+    spill_path = os.path.join(work_dir, f'responses_{partition}.npz')
+    np.savez(spill_path, Response_time=closest['Response_time'].to_numpy(),
+             since_cutoff=(closest['createdAt_time'] >= cutoff).to_numpy())
+    return partial_summary(closest, cutoff, outlier_threshold), spill_path
+
+
+def stream_summary(entry_paths, audit_paths, chunk_size, threshold, cutoff, outlier_threshold,
+                   cache_dir=None, rebuild=False, work_dir=None, max_workers=1):
+    """Build the report tables partition by partition instead of from whole DataFrames.
+
+    Entries and audit actions from any number of exports are split on disk by patientId, so
+    every partition holds all the rows of its patients and can be de-duplicated and matched on
+    its own. Only the additive partials and the per-partition response times (spilled to disk
+    for the median and histogram) outlive a partition, which keeps peak memory around
+    `chunk_size` rows whatever the size of the exports.
+
+    With `max_workers` > 1 that many partitions are matched and summarised (sketches
+    included) side by side in worker processes, and peak memory grows accordingly.
+    """
+    entry_caches = [cache_workbook(path, clean_patient_entries, cache_dir, rebuild) for path in entry_paths]
+    audit_caches = [cache_workbook(path, clean_audit_actions, cache_dir, rebuild) for path in audit_paths]
+    total_rows = sum(pa.ipc.open_file(pa.memory_map(path)).count_rows()
+                     for path in entry_caches + audit_caches)
+    n_partitions = max(1, math.ceil(total_rows / chunk_size))
+
+    work_dir = tempfile.mkdtemp(prefix='isla_stream_', dir=work_dir)
+    try:
+        _partition_to_disk(entry_caches, n_partitions, os.path.join(work_dir, 'entries'))
+        _partition_to_disk(audit_caches, n_partitions, os.path.join(work_dir, 'audits'))
+
+        arguments = [[work_dir] * n_partitions, range(n_partitions), [threshold] * n_partitions,
+                     [cutoff] * n_partitions, [outlier_threshold] * n_partitions]
+        if max_workers > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(_summarise_partition, *arguments))
+        else:
+            results = list(map(_summarise_partition, *arguments))
+        results = [result for result in results if result is not None]
+        partials = [partial for partial, _ in results]
+        spill_paths = [spill_path for _, spill_path in results]
+
+        if not partials:
+            raise ValueError('no entry was matched to an audit action')
+        combined = combine_partials(partials)
+        overall, since = combined['overall'], combined['since_cutoff']
+        median = _spilled_median(spill_paths, None, overall['min'], overall['max'], int(overall['count']))
+        median_since = _spilled_median(spill_paths, 'since_cutoff', since['min'], since['max'], int(since['count']))
+        histogram = _spilled_histogram(spill_paths, overall['min'], overall['max'])
+        return finish_summary(combined, median, median_since, histogram, cutoff)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,198 @@
+"""Time the Isla analysis stages and the dashboard callbacks on synthetic data.
+
+    python benchmarks/run_benchmarks.py --rows 1000 100000 --output results.json
+    python benchmarks/run_benchmarks.py --rows 100000 --baseline results.json --threshold 0.25
+
+Every stage reports wall time and peak traced memory (tracemalloc adds some overhead to the
+timings, pass --no-memory for bare timings). With --baseline the run exits with status 1
+when a stage is slower than the baseline by more than the threshold.
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+import synthetic
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ISLA_DIR = os.path.join(ROOT, 'Isla Health - Response Time Analysis')
+AUTOMOBILE_DASHBOARD = os.path.join(ROOT, 'Automobile Sales Statistics Dashboard.py')
+SPACEX_DASHBOARD = os.path.join(ROOT, 'IBM - SpaceX Falcon9 Landing Prediction', 'Dashboard.py')
+
+# Slider positions swept on every launch site
+PAYLOAD_RANGES = [(0, 10000), (0, 2500), (2000, 5000), (4000, 8000), (7500, 10000)]
+
+
+class Stages:
+    """Collects wall time and peak memory for each named stage."""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.results[name] = {'seconds': round(seconds, 6)}
+            if self.trace_memory:
+                self.results[name]['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_isla(rows, stages):
+    if ISLA_DIR not in sys.path:
+        sys.path.insert(0, ISLA_DIR)
+    from isla_cache import clean_audit_actions, clean_patient_entries
+    from isla_metrics import summarise
+    from isla_pipeline import match_closest_responses, remove_near_duplicates
+
+    raw_entries, raw_audits = synthetic.isla_exports(rows)
+    with stages.measure('isla.clean'):
+        entries = clean_patient_entries(raw_entries)
+        audits = clean_audit_actions(raw_audits)
+    with stages.measure('isla.dedup'):
+        entries = remove_near_duplicates(entries, pd.Timedelta(minutes=3))
+    with stages.measure('isla.match'):
+        closest = match_closest_responses(entries, audits)
+    with stages.measure('isla.aggregate'):
+        summarise(closest, pd.Timestamp('2013-06-01'), 30)
+
+
+def bench_automobile(rows, stages, work_dir):
+    os.environ['AUTOMOBILE_SNAPSHOT_DIR'] = os.path.join(work_dir, 'automobile')
+    # The dashboard imports dash_instrumentation from the top of the repository
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    csv_path = os.path.join(work_dir, 'historical_automobile_sales.csv')
+    synthetic.automobile_sales(rows).to_csv(csv_path, index=False)
+    dashboard = load_module(AUTOMOBILE_DASHBOARD, 'automobile_dashboard')
+    dashboard.write_snapshot(csv_path)
+
+    years = range(1980, 2024)
+    with stages.measure('automobile.first_request'):
+        dashboard.update_output(1980, 'Yearly Statistics')
+    dashboard.output_cache.cache_clear()
+    with stages.measure('automobile.update_output_cold'):
+        for year in years:
+            dashboard.update_output(year, 'Yearly Statistics')
+        dashboard.update_output(None, 'Recession Period Statistics')
+    with stages.measure('automobile.update_output_warm'):
+        for year in years:
+            dashboard.update_output(year, 'Yearly Statistics')
+        dashboard.update_output(None, 'Recession Period Statistics')
+
+
+def bench_spacex(rows, stages, work_dir):
+    launches = synthetic.spacex_launches(rows)
+    spacex_dir = os.path.join(work_dir, 'spacex')
+    os.makedirs(spacex_dir, exist_ok=True)
+    launches.to_csv(os.path.join(spacex_dir, 'spacex_launch_dash.csv'))
+
+    # The dashboard reads spacex_launch_dash.csv from the working directory at import
+    cwd = os.getcwd()
+    os.chdir(spacex_dir)
+    try:
+        with stages.measure('spacex.load'):
+            dashboard = load_module(SPACEX_DASHBOARD, 'spacex_dashboard')
+    finally:
+        os.chdir(cwd)
+
+    sites = ['ALL'] + synthetic.LAUNCH_SITES
+    with stages.measure('spacex.get_pie_chart'):
+        for site in sites:
+            dashboard.get_pie_chart(site)
+    with stages.measure('spacex.get_scatter_chart'):
+        for site in sites:
+            for payload_range in PAYLOAD_RANGES:
+                dashboard.get_scatter_chart(site, list(payload_range))
+
+
+BENCHMARKS = {
+    'isla': lambda rows, stages, work_dir: bench_isla(rows, stages),
+    'automobile': bench_automobile,
+    'spacex': bench_spacex,
+}
+
+
+def run(rows, names, trace_memory=True):
+    stages = Stages(trace_memory)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in names:
+            BENCHMARKS[name](rows, stages, work_dir)
+    return stages.results
+
+
+def regressions(results, baseline, threshold):
+    """Stages slower than the same stage at the same scale in the baseline by > threshold."""
+    found = []
+    for rows, stages in results['runs'].items():
+        for name, measured in stages.items():
+            reference = baseline.get('runs', {}).get(rows, {}).get(name)
+            if reference and measured['seconds'] > reference['seconds'] * (1 + threshold):
+                found.append({'rows': int(rows), 'stage': name, 'seconds': measured['seconds'],
+                              'baseline_seconds': reference['seconds']})
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000],
+                        help='Synthetic dataset sizes to run (10^3 to 10^7)')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS),
+                        help='Entry points to benchmark')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip the peak memory measurement (and its overhead on the timings)')
+    parser.add_argument('--output', help='Write the results as JSON to this file (default: stdout)')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown against the baseline, as a fraction (default: 0.2)')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    results = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'runs': {str(rows): run(rows, args.only, not args.no_memory) for rows in args.rows},
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['regressions'] = regressions(results, json.load(f), args.threshold)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+    if results.get('regressions'):
+        for regression in results['regressions']:
+            print(f"regression: {regression['stage']} at {regression['rows']} rows took "
+                  f"{regression['seconds']:.3f}s (baseline {regression['baseline_seconds']:.3f}s)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
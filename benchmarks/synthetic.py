@@ -0,0 +1,82 @@
+"""Synthetic data shaped like the real exports, at any number of rows."""
+import numpy as np
+import pandas as pd
+
+
+TEAMS = ['Nurses', 'Doctors', 'Admin', 'Pharmacy', 'Physio']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+VEHICLE_TYPES = ['Supperminicar', 'Smallfamiliycar', 'Mediumfamilycar', 'Executivecar', 'Sports']
+CITIES = ['Georgia', 'New York', 'California', 'Illinois']
+RECESSION_YEARS = [1980, 1981, 1982, 1991, 2000, 2001, 2007, 2008, 2009, 2020]
+LAUNCH_SITES = ['CCAFS LC-40', 'VAFB SLC-4E', 'KSC LC-39A', 'CCAFS SLC-40']
+BOOSTER_CATEGORIES = ['v1.0', 'v1.1', 'FT', 'B4', 'B5']
+
+
+def isla_exports(n_entries, audits_per_entry=2, entries_per_patient=8, seed=0):
+    """Patient_Entries (patientId, entryId, createdAt_time) and Audit_Actions
+    (patientId, timeResponded, team name) as they come out of read_excel."""
+    rng = np.random.default_rng(seed)
+    n_patients = max(1, n_entries // entries_per_patient)
+    start = pd.Timestamp('2012-06-01')
+    minutes = 2 * 365 * 24 * 60
+
+    # Heavy-tailed submission counts, so some patients land in the 51-100 bucket
+    patient_ids = rng.zipf(1.6, n_entries) % n_patients + 1
+    entries = pd.DataFrame({
+        'entryId': np.arange(1, n_entries + 1),
+        'patientId': patient_ids,
+        'createdAt_time': start + pd.to_timedelta(rng.integers(0, minutes, n_entries), unit='min'),
+    })
+    # A few bursts of near-duplicate submissions a minute apart
+    bursts = rng.choice(n_entries, size=n_entries // 20, replace=False)
+    entries.loc[bursts, 'createdAt_time'] = (entries['createdAt_time'].shift(1).ffill().iloc[bursts]
+                                            + pd.Timedelta(minutes=1)).to_numpy()
+    entries.loc[bursts, 'patientId'] = entries['patientId'].shift(1).fillna(1).iloc[bursts].to_numpy()
+
+    n_audits = n_entries * audits_per_entry
+    audits = pd.DataFrame({
+        'patientId': rng.choice(patient_ids, n_audits).astype(float),
+        'timeResponded': start + pd.to_timedelta(rng.integers(0, minutes + 60 * 24 * 60, n_audits), unit='min'),
+        'team name': rng.choice(TEAMS, n_audits),
+    })
+    return entries, audits
+
+
+def automobile_sales(n_rows, seed=0):
+    """historical_automobile_sales.csv columns, spread over 1980-2023."""
+    rng = np.random.default_rng(seed)
+    month_index = np.arange(n_rows) % (44 * 12)
+    year = 1980 + month_index // 12
+    month = month_index % 12
+    dates = pd.to_datetime({'year': year, 'month': month + 1, 'day': 1}) + pd.offsets.MonthEnd(0)
+    return pd.DataFrame({
+        'Date': dates.dt.strftime('%m/%d/%Y'),
+        'Year': year,
+        'Month': np.array(MONTHS)[month],
+        'Recession': np.isin(year, RECESSION_YEARS).astype(int),
+        'Consumer_Confidence': rng.uniform(70, 130, n_rows).round(2),
+        'Seasonality_Weight': rng.uniform(0.5, 1.5, n_rows).round(2),
+        'Price': rng.uniform(8000, 45000, n_rows).round(2),
+        'Advertising_Expenditure': rng.integers(1000, 5000, n_rows),
+        'Competition': rng.integers(3, 10, n_rows),
+        'GDP': rng.uniform(12, 70, n_rows).round(3),
+        'Growth_Rate': rng.uniform(-0.5, 0.8, n_rows).round(3),
+        'unemployment_rate': rng.choice([2.1, 2.5, 3.1, 4.2, 5.3, 6.0, 6.8], n_rows),
+        'Automobile_Sales': rng.uniform(100, 4000, n_rows).round(1),
+        'Vehicle_Type': rng.choice(VEHICLE_TYPES, n_rows),
+        'City': rng.choice(CITIES, n_rows),
+    })
+
+
+def spacex_launches(n_rows, seed=0):
+    """spacex_launch_dash.csv columns (the unnamed index column is written by to_csv)."""
+    rng = np.random.default_rng(seed)
+    category = rng.choice(BOOSTER_CATEGORIES, n_rows)
+    return pd.DataFrame({
+        'Flight Number': np.arange(1, n_rows + 1),
+        'Launch Site': rng.choice(LAUNCH_SITES, n_rows),
+        'class': rng.integers(0, 2, n_rows),
+        'Payload Mass (kg)': rng.uniform(0, 9600, n_rows).round(0),
+        'Booster Version': np.char.add('F9 ', category.astype(str)),
+        'Booster Version Category': category,
+    })
@@ -0,0 +1,162 @@
+"""Opt-in latency and payload instrumentation for Dash callbacks.
+
+Set DASH_INSTRUMENTATION=1 and call `instrument(app)` once every callback is registered.
+Each callback call then records its total time, the time spent in the phases the callback
+marks with `phase('data')` / `phase('figure')`, the JSON serialization of the response,
+the response size and (through `note_cache`) whether a cache served it. Rolling
+p50/p95/p99 per callback are served as JSON on /_callback_metrics and every call is
+logged as one JSON line at INFO on the 'dash_instrumentation' logger. Unless the logging
+setup already says otherwise, `instrument` lets that logger through at INFO and, when
+there is no handler at all, writes the lines to stderr.
+
+When the variable is not set `instrument` does nothing and `phase` / `note_cache` cost a
+single attribute check, so the calls can stay in the callbacks.
+"""
+import collections
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+ENABLED = os.environ.get('DASH_INSTRUMENTATION') == '1'
+METRICS_ENDPOINT = '/_callback_metrics'
+WINDOW = int(os.environ.get('DASH_INSTRUMENTATION_WINDOW', 1000))
+
+logger = logging.getLogger('dash_instrumentation')
+
+_current = contextvars.ContextVar('dash_instrumentation_record', default=None)
+_lock = threading.Lock()
+_history = collections.defaultdict(lambda: collections.deque(maxlen=WINDOW))
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        phases = self.record['phases']
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+
+def phase(name):
+    """Time a block of the running callback under `name` (no-op when not instrumented)."""
+    record = _current.get() if ENABLED else None
+    return _NULL_PHASE if record is None else _Phase(record, name)
+
+
+def note_cache(hit):
+    """Mark the running callback as served from (or missing) a cache."""
+    record = _current.get() if ENABLED else None
+    if record is not None:
+        record['cache'] = 'hit' if hit else 'miss'
+
+
+def _timed_serializer(to_json):
+    def timed_to_json(*args, **kwargs):
+        with phase('serialize'):
+            return to_json(*args, **kwargs)
+    return timed_to_json
+
+
+def _wrap_callback(callback_id, callback):
+    def instrumented(*args, **kwargs):
+        record = {'callback': callback_id, 'phases': {}, 'cache': None}
+        token = _current.set(record)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = callback(*args, **kwargs)
+            record['status'] = 'ok'
+            return response
+        except Exception as error:
+            # PreventUpdate and friends end up here too, they are not necessarily failures
+            record['status'] = type(error).__name__
+            raise
+        finally:
+            record['total'] = time.perf_counter() - started
+            _current.reset(token)
+            record['phases']['other'] = max(0.0, record['total'] - sum(record['phases'].values()))
+            record['response_bytes'] = len(response) if isinstance(response, (str, bytes)) else None
+            with _lock:
+                _history[callback_id].append(record)
+            logger.info(json.dumps(record))
+    instrumented.instrumented = True
+    return instrumented
+
+
+def _percentiles(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50': p50, 'p95': p95, 'p99': p99}
+
+
+def metrics():
+    """Rolling percentiles per callback over the last WINDOW calls."""
+    with _lock:
+        history = {callback_id: list(records) for callback_id, records in _history.items()}
+    report = {}
+    for callback_id, records in history.items():
+        phases = sorted({name for record in records for name in record['phases']})
+        caches = [record['cache'] for record in records if record['cache']]
+        report[callback_id] = {
+            'calls': len(records),
+            'total_seconds': _percentiles([record['total'] for record in records]),
+            'phase_seconds': {name: _percentiles([record['phases'].get(name, 0.0) for record in records])
+                              for name in phases},
+            'response_bytes': _percentiles([record['response_bytes'] for record in records]),
+            'cache_hit_ratio': caches.count('hit') / len(caches) if caches else None,
+        }
+    return report
+
+
+def instrument(app):
+    """Wrap every callback registered on `app` and add the metrics endpoint."""
+    if not ENABLED:
+        return app
+
+    import dash._callback
+    import flask
+
+    # The records are INFO lines, which the default WARNING level would drop
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    if not logger.hasHandlers():
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+
+    # The JSON encoding of a response happens inside Dash, time it as its own phase
+    if hasattr(dash._callback, 'to_json') and not getattr(dash._callback.to_json, 'instrumented', False):
+        dash._callback.to_json = _timed_serializer(dash._callback.to_json)
+        dash._callback.to_json.instrumented = True
+
+    for callback_id, entry in app.callback_map.items():
+        if 'callback' in entry and not getattr(entry['callback'], 'instrumented', False):
+            entry['callback'] = _wrap_callback(callback_id, entry['callback'])
+
+    app.server.add_url_rule(METRICS_ENDPOINT, 'callback_metrics',
+                            lambda: flask.jsonify(metrics()))
+    return app
@@ -0,0 +1,142 @@
+"""Read-only datasets shared by every worker process through memory-mapped files.
+
+`publish` writes each column of a DataFrame (and any extra arrays, e.g. a prebuilt index)
+as an .npy file in a new version directory under `root`, then points root/CURRENT at it
+with os.replace, so a refresh is atomic. `SharedDataset` maps the current version with
+np.load(mmap_mode='r'): the pages sit in the OS page cache once however many workers map
+them, and a newly published version is picked up by `current()` within `check_interval`
+seconds, without restarting the workers.
+
+Text columns are stored as integer codes and come back as categoricals.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+POINTER = 'CURRENT'
+# Bump when the on-disk layout changes
+LAYOUT_VERSION = 1
+# Versions kept on disk, the current one included. Older ones are removed on publish; a
+# worker still mapping one keeps its pages until it moves on (POSIX unlink semantics).
+KEEP_VERSIONS = 2
+
+
+class Dataset:
+    """One published version: the DataFrame and the extra arrays, all backed by the files."""
+
+    def __init__(self, version, data, arrays):
+        self.version = version
+        self.data = data
+        self.arrays = arrays
+
+
+def _save(directory, name, array):
+    np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(array), allow_pickle=False)
+
+
+def _load(directory, name):
+    return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r', allow_pickle=False)
+
+
+def _is_plain(dtype):
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biufmM'
+
+
+def _write_pointer(root, version):
+    tmp_path = os.path.join(root, f'{POINTER}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, POINTER))
+
+
+def read_pointer(root):
+    with open(os.path.join(root, POINTER)) as f:
+        return f.read().strip()
+
+
+def publish(root, data, arrays=None):
+    """Write `data` (and `arrays`, a dict of numpy arrays) as a new version and switch to it."""
+    os.makedirs(root, exist_ok=True)
+    version = f'{time.time_ns()}-{os.getpid()}'
+    # Written under a hidden name and renamed, so a half-written version is never visible
+    tmp_dir = os.path.join(root, f'.{version}')
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for position, (name, column) in enumerate(data.items()):
+        if _is_plain(column.dtype):
+            _save(tmp_dir, position, column.to_numpy())
+            columns.append({'name': name, 'kind': 'array'})
+            continue
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes, categories = column.cat.codes.to_numpy(), column.cat.categories
+        else:
+            codes, categories = pd.factorize(column)
+        _save(tmp_dir, f'{position}.codes', codes)
+        _save(tmp_dir, f'{position}.categories',
+              categories.to_numpy() if _is_plain(categories.dtype) else np.asarray(categories, dtype=str))
+        columns.append({'name': name, 'kind': 'categorical'})
+
+    names = list(arrays or {})
+    for position, name in enumerate(names):
+        _save(tmp_dir, f'array.{position}', arrays[name])
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'layout': LAYOUT_VERSION, 'rows': len(data), 'columns': columns, 'arrays': names}, f)
+
+    os.replace(tmp_dir, os.path.join(root, version))
+    _write_pointer(root, version)
+
+    versions = sorted(entry for entry in os.listdir(root)
+                      if not entry.startswith('.') and os.path.isdir(os.path.join(root, entry)))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return version
+
+
+def attach(root, version=None):
+    """Map a published version (the current one by default) read-only."""
+    version = version or read_pointer(root)
+    directory = os.path.join(root, version)
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta['layout'] != LAYOUT_VERSION:
+        raise ValueError(f'{directory} was written with layout {meta["layout"]}, publish it again')
+
+    columns = {}
+    for position, column in enumerate(meta['columns']):
+        if column['kind'] == 'array':
+            columns[column['name']] = _load(directory, position)
+        else:
+            # Only the (small) categories are copied into the process, the codes stay mapped
+            categories = pd.Index(np.load(os.path.join(directory, f'{position}.categories.npy')))
+            columns[column['name']] = pd.Categorical.from_codes(
+                _load(directory, f'{position}.codes'), categories=categories, validate=False)
+    data = pd.DataFrame(columns, copy=False)
+    arrays = {name: _load(directory, f'array.{position}') for position, name in enumerate(meta['arrays'])}
+    return Dataset(version, data, arrays)
+
+
+class SharedDataset:
+    """The current version under `root`, re-attached when a new one is published."""
+
+    def __init__(self, root, check_interval=1.0):
+        self.root = root
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._dataset = None
+        self._checked = 0.0
+
+    def current(self):
+        now = time.monotonic()
+        if self._dataset is None or now - self._checked >= self.check_interval:
+            with self._lock:
+                version = read_pointer(self.root)
+                if self._dataset is None or self._dataset.version != version:
+                    self._dataset = attach(self.root, version)
+                self._checked = now
+        return self._dataset
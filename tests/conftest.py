@@ -0,0 +1,31 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ISLA_DIR = os.path.join(ROOT, 'Isla Health - Response Time Analysis')
+
+# The analysis modules and the dashboards' shared modules are imported as top-level modules,
+# the same way the scripts import them; synthetic data comes from the benchmarks
+for path in [ISLA_DIR, ROOT, os.path.join(ROOT, 'benchmarks')]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Client-side callbacks are checked against their Python versions by running them in node
+requires_node = pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+
+
+def run_in_node(function, calls):
+    """Results of the JavaScript `function` (a clientside callback) for each list of arguments."""
+    from plotly.utils import PlotlyJSONEncoder
+
+    # Arguments go through the same JSON encoding Dash applies on the way to the browser
+    script = (f'var f = ({function});\n'
+              f'var calls = {json.dumps(calls, cls=PlotlyJSONEncoder)};\n'
+              'console.log(JSON.stringify(calls.map(function(args) { return f.apply(null, args); })));')
+    result = subprocess.run(['node'], input=script, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
@@ -0,0 +1,45 @@
+import gc
+import importlib.util
+import os
+import weakref
+
+import synthetic
+from conftest import ROOT, requires_node, run_in_node
+from shared_dataset import publish
+
+DASHBOARD = os.path.join(ROOT, 'Automobile Sales Statistics Dashboard.py')
+
+
+def load_dashboard(monkeypatch, tmp_path):
+    # Nothing is loaded at import, the snapshot directory only has to be writable
+    monkeypatch.setenv('AUTOMOBILE_SNAPSHOT_DIR', str(tmp_path))
+    monkeypatch.setenv('AUTOMOBILE_CLIENTSIDE', '1')
+    spec = importlib.util.spec_from_file_location('automobile_dashboard', DASHBOARD)
+    dashboard = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dashboard)
+    return dashboard
+
+
+@requires_node
+def test_client_side_year_dropdown_matches_server(monkeypatch, tmp_path):
+    dashboard = load_dashboard(monkeypatch, tmp_path)
+    selections = ['Yearly Statistics', 'Recession Period Statistics', None, 'unknown']
+    client = run_in_node(dashboard.UPDATE_YEAR_DROPDOWN_JS, [[selection] for selection in selections])
+    assert client == [dashboard.update_year_dropdown(selection) for selection in selections]
+
+
+def test_output_cache_lets_old_versions_go(monkeypatch, tmp_path):
+    shared_dir = str(tmp_path / 'shared')
+    publish(shared_dir, synthetic.automobile_sales(2000))
+    monkeypatch.setenv('AUTOMOBILE_SHARED_DIR', shared_dir)
+    dashboard = load_dashboard(monkeypatch, tmp_path)
+    dashboard.shared.check_interval = 0
+
+    first = dashboard.update_output(1990, 'Yearly Statistics')
+    old = weakref.ref(dashboard.shared.current())
+    assert dashboard.update_output(1990, 'Yearly Statistics') == first
+
+    publish(shared_dir, synthetic.automobile_sales(2000, seed=1))
+    assert dashboard.update_output(1990, 'Yearly Statistics') != first
+    gc.collect()
+    assert old() is None
@@ -0,0 +1,43 @@
+import importlib
+import json
+import logging
+
+import dash
+import pytest
+from dash import html
+from dash.dependencies import Input, Output
+
+import dash_instrumentation
+
+
+@pytest.fixture
+def instrumentation(monkeypatch):
+    # ENABLED is read at import, the module is reloaded disabled again afterwards
+    monkeypatch.setenv('DASH_INSTRUMENTATION', '1')
+    yield importlib.reload(dash_instrumentation)
+    monkeypatch.undo()
+    importlib.reload(dash_instrumentation)
+
+
+def test_records_are_logged_without_any_logging_setup(instrumentation, monkeypatch, capsys):
+    # No handler anywhere, pytest's own capturing handlers on the root logger included
+    logger = logging.getLogger('dash_instrumentation')
+    monkeypatch.setattr(logger, 'handlers', [])
+    monkeypatch.setattr(logging.getLogger(), 'handlers', [])
+    monkeypatch.setattr(logger, 'level', logging.NOTSET)
+
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Div(id='source', children='a'), html.Div(id='target')])
+    app.callback(Output('target', 'children'), Input('source', 'children'))(lambda value: value * 2)
+    instrumentation.instrument(app)
+
+    response = app.server.test_client().post('/_dash-update-component', json={
+        'output': 'target.children', 'outputs': {'id': 'target', 'property': 'children'},
+        'inputs': [{'id': 'source', 'property': 'children', 'value': 'a'}], 'changedPropIds': ['source.children']})
+    assert response.status_code == 200
+
+    record = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+    assert record['callback'] == 'target.children'
+    assert record['status'] == 'ok'
+    assert set(record['phases']) >= {'serialize', 'other'}
+    assert app.server.test_client().get(instrumentation.METRICS_ENDPOINT).json['target.children']['calls'] == 1
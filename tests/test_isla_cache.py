@@ -0,0 +1,20 @@
+import pandas as pd
+import pytest
+
+import isla_cache
+import synthetic
+from isla_cache import clean_audit_actions, load_workbook
+
+
+def test_load_workbook_reads_the_export_when_the_cache_cannot_be_written(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    _, raw_audits = synthetic.isla_exports(200)
+    path = tmp_path / 'Audit_Actions.xlsx'
+    raw_audits.to_excel(path, index=False)
+    cached = load_workbook(str(path), clean_audit_actions, cache_dir=str(tmp_path / 'cache'))
+
+    def read_only(*args, **kwargs):
+        raise PermissionError('read-only cache dir')
+    monkeypatch.setattr(isla_cache, 'cache_workbook', read_only)
+    parsed = load_workbook(str(path), clean_audit_actions, cache_dir=str(tmp_path / 'cache'))
+    pd.testing.assert_frame_equal(parsed, cached, check_dtype=False, check_categorical=False)
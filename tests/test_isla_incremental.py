@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic
+from isla_cache import clean_audit_actions, clean_patient_entries
+from isla_incremental import incremental_summary, load_state
+from isla_metrics import summarise
+from isla_pipeline import match_closest_responses, remove_near_duplicates
+
+THRESHOLD = pd.Timedelta(minutes=3)
+CUTOFF = pd.Timestamp('2013-06-01')
+
+
+def assert_same_summary(summary, expected):
+    for name in ['team', 'team_since_cutoff', 'day_of_week', 'month']:
+        pd.testing.assert_frame_equal(summary[name].reset_index(drop=True), expected[name].reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+    for name in ['overall', 'since_cutoff']:
+        for metric, value in expected[name].items():
+            assert np.isclose(summary[name][metric], value, equal_nan=True), (name, metric)
+    assert (summary['histogram'][0] == expected['histogram'][0]).all()
+    pd.testing.assert_series_equal(summary['submission_groups'], expected['submission_groups'], check_dtype=False)
+    for name, table in expected['percentiles'].items():
+        pd.testing.assert_frame_equal(summary['percentiles'][name], table, check_categorical=False)
+
+
+def test_incremental_summary_equals_full_recompute(tmp_path):
+    raw_entries, raw_audits = synthetic.isla_exports(4000)
+    # Exports grow by appending newer rows
+    entries = clean_patient_entries(raw_entries).sort_values('createdAt_time', kind='stable').reset_index(drop=True)
+    audits = clean_audit_actions(raw_audits).sort_values('timeResponded', kind='stable').reset_index(drop=True)
+    state_path = str(tmp_path / 'state.pkl')
+
+    # Some cuts fall inside a burst of near-duplicates, so the burst straddles two runs
+    gaps = entries.sort_values(['patientId', 'createdAt_time']).groupby('patientId')['createdAt_time'].diff()
+    bursts = entries.loc[gaps[gaps <= THRESHOLD].index, 'createdAt_time']
+    cuts = pd.date_range('2012-08-01', '2014-08-01', periods=8).append(pd.DatetimeIndex(bursts.iloc[::40]))
+    cuts = cuts.sort_values().append(pd.DatetimeIndex(['2020-01-01']))
+    for cut in cuts:
+        grown_entries = entries[entries['createdAt_time'] < cut]
+        # The audit export runs ahead of the entries, so some of its actions only find their
+        # entry in a later run
+        grown_audits = audits[audits['timeResponded'] < cut + pd.Timedelta(days=20)]
+        summary = incremental_summary(state_path, grown_entries, grown_audits, THRESHOLD, CUTOFF, 30)
+        closest = match_closest_responses(remove_near_duplicates(grown_entries, THRESHOLD), grown_audits)
+        assert_same_summary(summary, summarise(closest, CUTOFF, 30))
+
+
+def test_state_keeps_sorted_response_times_beside_the_pickle(tmp_path):
+    raw_entries, raw_audits = synthetic.isla_exports(1000)
+    entries = clean_patient_entries(raw_entries).sort_values('createdAt_time', kind='stable').reset_index(drop=True)
+    audits = clean_audit_actions(raw_audits).sort_values('timeResponded', kind='stable').reset_index(drop=True)
+    state_path = str(tmp_path / 'state.pkl')
+    half = len(entries) // 2
+
+    incremental_summary(state_path, entries.iloc[:half], audits.iloc[:len(audits) // 2], THRESHOLD, CUTOFF, 30)
+    assert 'response_time' not in pd.read_pickle(state_path)
+    ordered = load_state(state_path)['response_time']
+    assert len(ordered) and (np.diff(ordered) >= 0).all()
+
+    # An array left over from another save no longer matches the pickle: the state is rebuilt
+    np.save(state_path + '.response_time.npy', ordered[:-1])
+    assert load_state(state_path) is None
+    summary = incremental_summary(state_path, entries, audits, THRESHOLD, CUTOFF, 30)
+    closest = match_closest_responses(remove_near_duplicates(entries, THRESHOLD), audits)
+    assert_same_summary(summary, summarise(closest, CUTOFF, 30))
+
+
+def test_audit_order_is_only_checked_per_patient(tmp_path):
+    raw_entries, raw_audits = synthetic.isla_exports(2000)
+    entries = clean_patient_entries(raw_entries).sort_values('createdAt_time', kind='stable').reset_index(drop=True)
+    audits = clean_audit_actions(raw_audits).sort_values('timeResponded', kind='stable').reset_index(drop=True)
+    state_path = str(tmp_path / 'state.pkl')
+    first_cut, second_cut = pd.Timestamp('2013-01-01'), pd.Timestamp('2014-01-01')
+
+    # The first export already runs to the second cut for some patients, the second one
+    # appends the older actions of the others
+    early = audits['patientId'].isin(audits['patientId'].drop_duplicates().iloc[::3])
+    first = (audits['timeResponded'] < first_cut) | (early & (audits['timeResponded'] < second_cut))
+    second = ~first & (audits['timeResponded'] < second_cut)
+    grown_audits = pd.concat([audits[first], audits[second]], ignore_index=True)
+    grown_entries = entries[entries['createdAt_time'] < first_cut]
+    incremental_summary(state_path, grown_entries, grown_audits.iloc[:first.sum()], THRESHOLD, CUTOFF, 30)
+    grown_entries = entries[entries['createdAt_time'] < second_cut]
+    summary = incremental_summary(state_path, grown_entries, grown_audits, THRESHOLD, CUTOFF, 30)
+    closest = match_closest_responses(remove_near_duplicates(grown_entries, THRESHOLD), grown_audits)
+    assert_same_summary(summary, summarise(closest, CUTOFF, 30))
+
+    # An action older than one already processed for the same patient needs a rebuild
+    older = audits[audits['patientId'] == grown_audits['patientId'].iloc[-1]].iloc[:1]
+    with pytest.raises(ValueError, match='rebuild'):
+        incremental_summary(state_path, grown_entries, pd.concat([grown_audits, older], ignore_index=True),
+                            THRESHOLD, CUTOFF, 30)
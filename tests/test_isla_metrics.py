@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from isla_metrics import REPORT_SPECS, GroupSpec, summarise
+
+CUTOFF = pd.Timestamp('2013-06-01')
+
+
+def closest_responses(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'patientId': rng.integers(0, n // 5, n),
+        'entryId': np.arange(n),
+        'createdAt_time': pd.Timestamp('2012-06-01') + pd.to_timedelta(rng.integers(0, 730 * 24, n), unit='h'),
+        'team name': rng.choice(['Nurses', 'Doctors', 'Admin', 'Pharmacy'], n),
+        'Response_time': rng.exponential(30, n),
+    })
+
+
+def test_new_spec_is_reported():
+    closest = closest_responses(2000)
+    specs = REPORT_SPECS + [GroupSpec('team_month', ('team name', 'year_month')),
+                            GroupSpec('team_month_since_cutoff', ('team name', 'year_month'), since_cutoff=True)]
+    summary = summarise(closest, CUTOFF, 30, specs)
+
+    months = closest['createdAt_time'].dt.to_period('M').astype(str).rename('year_month')
+    expected = closest.groupby(['team name', months])['Response_time'].mean().reset_index()
+    pd.testing.assert_frame_equal(summary['team_month'].reset_index(drop=True), expected)
+
+    since = closest[closest['createdAt_time'] >= CUTOFF]
+    expected = since.groupby(['team name', months[since.index]])['Response_time'].mean().reset_index()
+    pd.testing.assert_frame_equal(summary['team_month_since_cutoff'].reset_index(drop=True), expected)
+
+
+def test_key_metrics_since_cutoff():
+    closest = closest_responses(2000)
+    summary = summarise(closest, CUTOFF, 30)
+    since = closest.loc[closest['createdAt_time'] >= CUTOFF, 'Response_time']
+    assert np.isclose(summary['since_cutoff']['mean'], since.mean())
+    assert summary['since_cutoff']['median'] == since.median()
+    assert summary['since_cutoff']['min'] == since.min()
+    assert summary['since_cutoff']['max'] == since.max()
+    assert summary['since_cutoff']['outliers'] == (since > 30).sum()
+
+    # A cutoff after every entry leaves nothing since it
+    empty = summarise(closest, pd.Timestamp('2020-01-01'), 30)['since_cutoff']
+    assert np.isnan(empty['mean']) and np.isnan(empty['min']) and np.isnan(empty['max'])
+    assert empty['outliers'] == 0
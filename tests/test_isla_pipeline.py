@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from isla_pipeline import match_closest_responses
+
+
+def merge_closest_responses(entries, audit_actions):
+    # The original script's matching: merge on patientId, keep responses at or after the
+    # entry, then the smallest response time per entryId
+    merged_df = pd.merge(entries, audit_actions, on='patientId', how='left')
+    merged_df = merged_df[merged_df['timeResponded'] >= merged_df['createdAt_time']]
+    merged_df['Response_time'] = (merged_df['timeResponded'] - merged_df['createdAt_time']) / pd.Timedelta(days=1)
+    merged_df = merged_df.sort_values(by=['patientId', 'entryId', 'Response_time'])
+    return merged_df.drop_duplicates(subset=['entryId'], keep='first')
+
+
+def random_exports(seed):
+    rng = np.random.default_rng(seed)
+    n_entries, n_patients = rng.integers(1, 60), rng.integers(1, 12)
+    start = pd.Timestamp('2013-01-01')
+    # Coarse times, so entries share createdAt_time and audit actions land exactly on them
+    entries = pd.DataFrame({
+        'patientId': rng.integers(0, n_patients, n_entries),
+        # Some entryIds are reused, by the same patient or another one
+        'entryId': rng.integers(0, max(1, n_entries * 3 // 4), n_entries),
+        'createdAt_time': start + pd.to_timedelta(rng.integers(0, 20, n_entries), unit='h'),
+    })
+    n_audits = rng.integers(0, 80)
+    # Only some of the patients ever get a response
+    responding = rng.choice(n_patients, size=max(1, n_patients // 2), replace=False)
+    audits = pd.DataFrame({
+        'patientId': rng.choice(responding, n_audits),
+        'timeResponded': start + pd.to_timedelta(rng.integers(0, 24, n_audits), unit='h'),
+        'team name': rng.choice(['Nurses', 'Doctors', 'Admin'], n_audits),
+    })
+    return entries, audits
+
+
+def assert_same_responses(matched, expected):
+    columns = ['patientId', 'entryId', 'createdAt_time', 'timeResponded', 'team name', 'Response_time']
+    pd.testing.assert_frame_equal(matched[columns].reset_index(drop=True),
+                                  expected[columns].reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_as_of_search_matches_merge_path(seed):
+    entries, audits = random_exports(seed)
+    assert_same_responses(match_closest_responses(entries, audits), merge_closest_responses(entries, audits))
+
+
+def test_patients_without_audit_actions_are_left_out():
+    entries = pd.DataFrame({'patientId': [1, 2, 2], 'entryId': [10, 20, 21],
+                            'createdAt_time': pd.to_datetime(['2013-01-01 09:00'] * 3)})
+    audits = pd.DataFrame({'patientId': [2, 2], 'timeResponded': pd.to_datetime(['2013-01-01 09:00', '2013-01-01 10:00']),
+                           'team name': ['Nurses', 'Admin']})
+    matched = match_closest_responses(entries, audits)
+    assert_same_responses(matched, merge_closest_responses(entries, audits))
+    assert matched['entryId'].tolist() == [20, 21]
+    assert matched['Response_time'].tolist() == [0, 0]
+    assert matched['team name'].tolist() == ['Nurses', 'Nurses']
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from isla_metrics import PERCENTILES, percentile_tables
+from isla_sketch import RELATIVE_ACCURACY, build_sketches, bucket_of, group_quantiles, merge_sketches
+
+
+def assert_within_accuracy(estimated, exact):
+    assert np.all(np.abs(estimated - exact) <= RELATIVE_ACCURACY * exact + 1e-12)
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 17, 100, 5000])
+def test_group_quantiles_within_relative_accuracy_of_np_quantile(size):
+    rng = np.random.default_rng(size)
+    n_groups = 20
+    values = rng.lognormal(1, 1.5, size * n_groups)
+    values[rng.choice(len(values), len(values) // 10)] = 0
+    codes = np.repeat(np.arange(n_groups), size)
+    quantiles = [0, 0.25, 0.5, 0.9, 0.99, 1]
+
+    rows = pd.DataFrame({'code': codes, 'bucket': bucket_of(values)}).value_counts().reset_index()
+    estimated = group_quantiles(rows['code'].to_numpy(), n_groups, rows['bucket'].to_numpy(),
+                                rows['count'].to_numpy(), quantiles)
+    exact = np.array([np.quantile(values[codes == group], quantiles) for group in range(n_groups)])
+    assert_within_accuracy(estimated, exact)
+
+
+def test_percentile_tables_match_exact_monthly_percentiles():
+    rng = np.random.default_rng(0)
+    # About 17 responses a month, where nearest-rank and interpolated percentiles differ most
+    closest = pd.DataFrame({
+        'createdAt_time': pd.Timestamp('2012-06-01') + pd.to_timedelta(rng.integers(0, 730, 400), unit='D'),
+        'team name': rng.choice(['Nurses', 'Doctors', 'Admin'], 400),
+        'Response_time': rng.exponential(30, 400),
+    })
+    # Sketches built in parts and merged answer the same as the whole
+    sketches = merge_sketches(build_sketches(closest.iloc[start:start + 60]) for start in range(0, 400, 60))
+    tables = percentile_tables(sketches)
+
+    months = closest['createdAt_time'].dt.to_period('M')
+    exact = closest.groupby(months)['Response_time'].quantile(PERCENTILES).unstack()
+    estimated = tables['month'].set_index('year_month')
+    assert_within_accuracy(estimated.to_numpy(), exact.to_numpy())
+
+    exact = closest.groupby('team name')['Response_time'].quantile(PERCENTILES).unstack()
+    assert_within_accuracy(tables['team'].set_index('team name').to_numpy(), exact.to_numpy())
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic
+from isla_cache import clean_audit_actions, clean_patient_entries, load_workbook
+from isla_metrics import summarise
+from isla_pipeline import match_closest_responses, remove_near_duplicates
+
+pytest.importorskip('pyarrow')
+pytest.importorskip('openpyxl')
+from isla_stream import stream_summary  # noqa: E402
+
+THRESHOLD = pd.Timedelta(minutes=3)
+CUTOFF = pd.Timestamp('2013-06-01')
+
+
+def test_stream_matches_in_memory_with_mixed_patient_id_dtypes(tmp_path):
+    entries, audits = synthetic.isla_exports(3000)
+    # One missing patientId turns the entries' IDs into float categories in the cache,
+    # while the audit actions keep a plain integer column
+    entries['patientId'] = entries['patientId'].astype(float)
+    entries.loc[5, 'patientId'] = np.nan
+    entries_path, audits_path = str(tmp_path / 'entries.xlsx'), str(tmp_path / 'audits.xlsx')
+    entries.to_excel(entries_path, index=False)
+    audits.to_excel(audits_path, index=False)
+
+    cache_dir = str(tmp_path / 'cache')
+    cached_entries = load_workbook(entries_path, clean_patient_entries, cache_dir=cache_dir)
+    cached_audits = load_workbook(audits_path, clean_audit_actions, cache_dir=cache_dir)
+    assert cached_entries['patientId'].dtype != cached_audits['patientId'].dtype
+
+    closest = match_closest_responses(remove_near_duplicates(cached_entries, THRESHOLD), cached_audits)
+    expected = summarise(closest, CUTOFF, 30)
+    streamed = stream_summary([entries_path], [audits_path], 1000, THRESHOLD, CUTOFF, 30,
+                              cache_dir=cache_dir, work_dir=str(tmp_path))
+
+    for name in ['overall', 'since_cutoff']:
+        assert streamed[name] == pytest.approx(expected[name], nan_ok=True)
+    pd.testing.assert_series_equal(streamed['submission_groups'], expected['submission_groups'],
+                                   check_dtype=False)
+    for name in ['team', 'day_of_week', 'month']:
+        pd.testing.assert_frame_equal(streamed[name].reset_index(drop=True),
+                                      expected[name].reset_index(drop=True), check_dtype=False)
@@ -0,0 +1,64 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from shared_dataset import KEEP_VERSIONS, SharedDataset, attach, publish, read_pointer
+
+
+def launches(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    payload = rng.uniform(0, 10000, rows)
+    payload[::7] = np.nan
+    launched = pd.Series(pd.date_range('2010-06-04', periods=rows, freq='17D'))
+    launched[::9] = pd.NaT
+    booster = pd.Series(pd.Categorical(rng.choice(['v1.0', 'FT', 'B4', 'B5'], rows)))
+    booster[::5] = np.nan
+    site = pd.Series(rng.choice(['CCAFS LC-40', 'VAFB SLC-4E', 'KSC LC-39A'], rows), dtype=object)
+    site[::11] = np.nan
+    return pd.DataFrame({'Flight Number': np.arange(rows), 'Payload Mass (kg)': payload, 'Launched': launched,
+                         'Booster Version Category': booster, 'Launch Site': site,
+                         'class': rng.integers(0, 2, rows).astype(bool)})
+
+
+def test_publish_attach_round_trip(tmp_path):
+    data = launches(500)
+    arrays = {'rows ALL': np.arange(500), 'payload sorted': np.sort(data['Payload Mass (kg)'].to_numpy())}
+    version = publish(str(tmp_path), data, arrays)
+    dataset = attach(str(tmp_path))
+
+    assert dataset.version == version == read_pointer(str(tmp_path))
+    assert list(dataset.data.columns) == list(data.columns)
+    for name in ['Flight Number', 'Payload Mass (kg)', 'Launched', 'class']:
+        # (as arrays: the mapped columns are np.memmap, which assert_series_equal tells apart)
+        assert dataset.data[name].dtype == data[name].dtype
+        np.testing.assert_array_equal(dataset.data[name].to_numpy(), data[name].to_numpy())
+    # Text comes back as categoricals, missing values included
+    for name in ['Booster Version Category', 'Launch Site']:
+        assert isinstance(dataset.data[name].dtype, pd.CategoricalDtype)
+        pd.testing.assert_series_equal(dataset.data[name].astype(object), data[name].astype(object))
+    assert list(dataset.arrays) == list(arrays)
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(dataset.arrays[name], array)
+        assert isinstance(dataset.arrays[name], np.memmap)
+
+
+def test_current_moves_to_a_new_version_after_the_check_interval(tmp_path):
+    first = publish(str(tmp_path), launches(50))
+    shared = SharedDataset(str(tmp_path), check_interval=0.5)
+    assert shared.current().version == first
+
+    second = publish(str(tmp_path), launches(80, seed=1))
+    assert shared.current().version == first
+    time.sleep(0.6)
+    dataset = shared.current()
+    assert dataset.version == second and len(dataset.data) == 80
+    assert shared.current() is dataset
+
+
+def test_publish_keeps_the_latest_versions(tmp_path):
+    versions = [publish(str(tmp_path), launches(20, seed=seed)) for seed in range(KEEP_VERSIONS + 3)]
+    assert sorted(os.listdir(tmp_path)) == sorted(versions[-KEEP_VERSIONS:] + ['CURRENT'])
+    assert read_pointer(str(tmp_path)) == versions[-1]
+    assert attach(str(tmp_path), versions[-KEEP_VERSIONS]).version == versions[-KEEP_VERSIONS]
@@ -0,0 +1,104 @@
+import base64
+import importlib.util
+import os
+
+import dash
+import numpy as np
+import plotly.graph_objects as go
+
+import synthetic
+from conftest import ROOT, requires_node, run_in_node
+
+DASHBOARD = os.path.join(ROOT, 'IBM - SpaceX Falcon9 Landing Prediction', 'Dashboard.py')
+
+
+def load_dashboard(directory, launches, monkeypatch):
+    # The dashboard reads spacex_launch_dash.csv from the working directory at import
+    launches.to_csv(os.path.join(directory, 'spacex_launch_dash.csv'))
+    monkeypatch.chdir(directory)
+    spec = importlib.util.spec_from_file_location('spacex_dashboard', DASHBOARD)
+    dashboard = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(dashboard)
+    return dashboard
+
+
+def test_binned_scatter_skips_missing_payloads(tmp_path, monkeypatch):
+    launches = synthetic.spacex_launches(20000)
+    launches.loc[::7, 'Payload Mass (kg)'] = np.nan
+    dashboard = load_dashboard(tmp_path, launches, monkeypatch)
+
+    payload = launches['Payload Mass (kg)']
+    for site in ['ALL'] + synthetic.LAUNCH_SITES:
+        entry = dashboard.site_entry(dashboard.launch_index, site)
+        at_site = launches['Launch Site'] == site if site != 'ALL' else True
+        for low, high in [(0, 10000), (2000, 5000), (-np.inf, np.inf)]:
+            traces = dashboard.binned_scatter_traces(entry, low, high)
+            plotted = sum(int(trace['customdata'].sum()) for trace in traces)
+            assert plotted == (at_site & payload.between(low, high)).sum()
+            assert all(np.isfinite(trace['x']).all() for trace in traces)
+
+
+def test_slider_patch_needs_the_same_traces(tmp_path, monkeypatch):
+    launches = synthetic.spacex_launches(20000)
+    dashboard = load_dashboard(tmp_path, launches, monkeypatch)
+    monkeypatch.setattr(dashboard, 'slider_moved', lambda: True)
+
+    figure, shown = dashboard.get_scatter_chart('ALL', [0, 10000])
+    assert isinstance(figure, go.Figure)
+    patch, key = dashboard.get_scatter_chart('ALL', [2000, 5000], shown)
+    assert isinstance(patch, dash.Patch) and key == shown
+
+    # A refresh in between (another dataset version, or a booster category more) redraws the chart
+    version, site, boosters = shown
+    for stale in [None, ['older', site, boosters], [version, site, boosters - 1], [version, 'CCAFS LC-40', boosters]]:
+        figure, key = dashboard.get_scatter_chart('ALL', [2000, 5000], stale)
+        assert isinstance(figure, go.Figure) and key == shown
+
+
+def plain(value):
+    # A figure as JSON-native values: plotly's base64 typed arrays decoded, numbers as floats
+    if isinstance(value, dict) and 'bdata' in value:
+        return plain(np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype']))
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, np.ndarray):
+        return plain(value.tolist())
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+@requires_node
+def test_client_side_scatter_matches_server(tmp_path, monkeypatch):
+    monkeypatch.setenv('SPACEX_CLIENTSIDE', '1')
+    launches = synthetic.spacex_launches(1500)
+    launches.loc[::11, 'Payload Mass (kg)'] = np.nan
+    dashboard = load_dashboard(tmp_path, launches, monkeypatch)
+    store = next(child for child in dashboard.app.layout().children if getattr(child, 'id', None) == 'launch-store')
+
+    sites = ['ALL'] + synthetic.LAUNCH_SITES + ['unknown', None]
+    # Slider ends on actual payloads too, where an off-by-one in the bounds would show
+    edge = float(launches['Payload Mass (kg)'].dropna().iloc[0])
+    ranges = [[0, 10000], [2000, 5000], [5000, 5000], [9600, 10000], [0, 0], [edge, edge], [edge - 500, edge]]
+    cases = [(site, payload_range) for site in sites for payload_range in ranges]
+    client = run_in_node(dashboard.SCATTER_CHART_JS, [[site, payload_range, store.data] for site, payload_range in cases])
+    for (site, payload_range), figure in zip(cases, client):
+        server, _ = dashboard.get_scatter_chart(site, payload_range)
+        assert plain(go.Figure(figure).to_plotly_json()) == plain(server.to_plotly_json()), (site, payload_range)
+
+    # The store is built once, not on every page load
+    again = next(child for child in dashboard.app.layout().children if getattr(child, 'id', None) == 'launch-store')
+    assert again.data is store.data
+
+
+def test_client_side_keeps_large_histories_on_server(tmp_path, monkeypatch):
+    monkeypatch.setenv('SPACEX_CLIENTSIDE', '1')
+    launches = synthetic.spacex_launches(6000)
+    dashboard = load_dashboard(tmp_path, launches, monkeypatch)
+
+    assert not dashboard.CLIENTSIDE_SCATTER
+    assert all(getattr(child, 'id', None) != 'launch-store' for child in dashboard.app.layout().children)
+    assert any('success-payload-scatter-chart.figure' in output for output in dashboard.app.callback_map)
+    assert not dashboard.app._inline_scripts